@@ -0,0 +1,178 @@
+# benchmark.py
+#
+# Measures start, check and reset for every scenario in scratch directories
+# and compares the results with a saved baseline:
+#
+#   python benchmark.py --output baseline.json
+#   python benchmark.py --baseline baseline.json --threshold 1.5
+
+import click
+import json
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+PHASES = ('start', 'check', 'reset')
+
+# Differences below this many seconds are treated as noise when comparing with a baseline
+NOISE_FLOOR_SECONDS = 0.05
+
+GIT_SHIM = """#!/bin/sh
+echo >> "$GIT_LEARN_BENCH_COUNTER"
+exec "$GIT_LEARN_BENCH_REAL_GIT" "$@"
+"""
+
+def git_process_count(counter_file):
+    """Number of git processes started so far, one line per invocation of the shim"""
+    try:
+        return os.path.getsize(counter_file)
+    except OSError:
+        return 0
+
+def run_worker(title, scratch_dir):
+    """Run start, check and reset for one scenario in this process and return the measurements"""
+    import resource
+    import workspaces
+    from git_commands import Repo
+    from scenarios import SCENARIOS
+
+    scenario = next(s for s in SCENARIOS if s.title == title)
+    manager = workspaces.WorkspaceManager(sessions_dir=os.path.join(scratch_dir, "sessions"))
+    session = manager.session("benchmark")
+    counter_file = os.environ["GIT_LEARN_BENCH_COUNTER"]
+
+    def check():
+        with Repo(session.repo_path) as repo:
+            scenario.check_func(repo)
+
+    actions = {
+        'start': lambda: manager.start(session, scenario),
+        'check': check,
+        'reset': lambda: manager.reset(session, scenario),
+    }
+    results = {}
+    for phase in PHASES:
+        processes_before = git_process_count(counter_file)
+        start = time.perf_counter()
+        actions[phase]()
+        results[phase] = {
+            'seconds': round(time.perf_counter() - start, 6),
+            'git_processes': git_process_count(counter_file) - processes_before,
+        }
+
+    # ru_maxrss is in kilobytes on Linux; git children are included once they have exited
+    results['peak_rss_kb'] = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                 resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return results
+
+def benchmark_scenario(title, scratch_dir, shim_dir, real_git):
+    """Run one scenario in a fresh interpreter with an empty template cache"""
+    os.makedirs(scratch_dir)
+    env = dict(os.environ,
+               PATH=f"{shim_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               GIT_LEARN_BENCH_COUNTER=os.path.join(scratch_dir, "git-processes"),
+               GIT_LEARN_BENCH_REAL_GIT=real_git,
+               GIT_LEARN_TEMPLATE_DIR=os.path.join(scratch_dir, "templates"),
+               GIT_LEARN_MANIFEST=os.path.join(scratch_dir, "scenario_manifest.json"))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", title, scratch_dir],
+                            cwd=PACKAGE_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def measure_startup(repeat):
+    """Best wall time of a cold 'git-learn list' in a new interpreter"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(PACKAGE_DIR, "cli.py"), "list"],
+                       cwd=PACKAGE_DIR, stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return round(min(timings), 6)
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for title, phases in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(title)
+        if not previous:
+            continue
+        for phase in PHASES:
+            current, before = phases[phase], previous[phase]
+            if (current['seconds'] > before['seconds'] * threshold
+                    and current['seconds'] - before['seconds'] > NOISE_FLOOR_SECONDS):
+                regressions.append(f"{title} {phase}: {before['seconds']:.3f}s -> {current['seconds']:.3f}s")
+            if current['git_processes'] > before['git_processes']:
+                regressions.append(f"{title} {phase}: {before['git_processes']} -> {current['git_processes']} git processes")
+    previous_startup = baseline.get('startup', {}).get('list_seconds')
+    startup = results['startup']['list_seconds']
+    if previous_startup and startup > previous_startup * threshold and startup - previous_startup > NOISE_FLOOR_SECONDS:
+        regressions.append(f"git-learn list startup: {previous_startup:.3f}s -> {startup:.3f}s")
+    return regressions
+
+@click.command()
+@click.option('--worker', nargs=2, hidden=True)
+@click.option('--scenario', 'titles', multiple=True, help="Only benchmark these scenarios (default: all)")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write the results to this JSON file")
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help="Compare the results with this JSON file")
+@click.option('--threshold', type=float, default=1.5, show_default=True,
+              help="Fail when a phase takes longer than the baseline times this factor")
+@click.option('--startup-budget', type=float, default=0.5, show_default=True,
+              help="Fail when a cold 'git-learn list' takes longer than this many seconds")
+@click.option('--repeat', type=int, default=3, show_default=True, help="Runs of the startup measurement")
+def main(worker, titles, output, baseline, threshold, startup_budget, repeat):
+    """Benchmark scenario start, check and reset latency"""
+    if worker:
+        click.echo(json.dumps(run_worker(*worker)))
+        return
+
+    from scenarios import SCENARIOS
+
+    real_git = shutil.which("git")
+    results = {
+        'git_version': subprocess.run([real_git, "--version"], capture_output=True, text=True).stdout.strip(),
+        'python_version': platform.python_version(),
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory(prefix="git-learn-bench-") as scratch:
+        shim_dir = os.path.join(scratch, "bin")
+        os.makedirs(shim_dir)
+        shim = os.path.join(shim_dir, "git")
+        with open(shim, 'w') as f:
+            f.write(GIT_SHIM)
+        os.chmod(shim, os.stat(shim).st_mode | stat.S_IEXEC)
+
+        for index, scenario in enumerate(SCENARIOS):
+            if titles and scenario.title not in titles:
+                continue
+            measurements = benchmark_scenario(scenario.title, os.path.join(scratch, str(index)), shim_dir, real_git)
+            results['scenarios'][scenario.title] = measurements
+            click.echo(f"{scenario.title}: " + ", ".join(
+                f"{phase} {measurements[phase]['seconds']:.3f}s/{measurements[phase]['git_processes']} git"
+                for phase in PHASES) + f", peak RSS {measurements['peak_rss_kb']} KB", err=True)
+
+    results['startup'] = {'list_seconds': measure_startup(repeat)}
+    click.echo(f"git-learn list startup: {results['startup']['list_seconds']:.3f}s", err=True)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        click.echo(json.dumps(results, indent=2))
+
+    failures = []
+    if results['startup']['list_seconds'] > startup_budget:
+        failures.append(f"git-learn list startup {results['startup']['list_seconds']:.3f}s exceeds the {startup_budget:.3f}s budget")
+    if baseline:
+        with open(baseline, 'r') as f:
+            failures.extend(find_regressions(results, json.load(f), threshold))
+    for failure in failures:
+        click.echo(f"REGRESSION: {failure}", err=True)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+import git_commands
+import odb
+import repo_inspect
+
+CACHE_DIR = os.environ.get("GIT_LEARN_CHECK_CACHE", os.path.join(str(Path.home()), ".cache", "git-learn", "checks"))
+# Modules every checker reads the repository through; changing any of them invalidates all cached results
+CHECKER_MODULES = (git_commands, odb, repo_inspect)
+
+@lru_cache(maxsize=None)
+def checker_hash():
+    """Hash of the CHECKER_MODULES sources"""
+    digest = hashlib.sha256()
+    for module in CHECKER_MODULES:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def entry_path(repo, scenario):
+    """One cache file per repository and scenario; it only ever holds the latest result"""
+    key = hashlib.sha256(f"{os.path.realpath(repo.path)}\0{scenario.title}".encode()).hexdigest()[:32]
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def load_entry(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_entry(path, entry):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=CACHE_DIR, delete=False) as f:
+            json.dump(entry, f)
+        os.replace(f.name, path)
+    except OSError:
+        # Without a writable cache every check just runs in full
+        pass
+
+def check(repo, scenario):
+    """Run scenario.check_func on repo unless it already ran on exactly this state.
+
+    Results are kept outside the repository, keyed by the scenario source,
+    the shared checker modules and repo_inspect.state_fingerprint(), so any
+    change to HEAD, a ref, the index or the scenario's worktree_files runs
+    the checker again. Returns (passed, cached).
+    """
+    path = entry_path(repo, scenario)
+    fingerprint = repo_inspect.state_fingerprint(repo, scenario.worktree_files)
+    entry = load_entry(path)
+    if (entry and entry["fingerprint"] == fingerprint and entry["source_hash"] == scenario.source_hash
+            and entry.get("checker_hash") == checker_hash()):
+        return entry["passed"], True
+
+    passed = bool(scenario.check_func(repo))
+    # Only remember the result if the repository didn't change while the checker ran
+    if repo_inspect.state_fingerprint(repo, scenario.worktree_files) == fingerprint:
+        save_entry(path, {"scenario": scenario.title, "source_hash": scenario.source_hash,
+                          "checker_hash": checker_hash(), "fingerprint": fingerprint, "passed": passed})
+    return passed, False
@@ -1,34 +1,71 @@
 # cli.py
 
 import click
+import json
 import os
-import shutil
-from pathlib import Path
+import time
 from scenarios import SCENARIOS
-from git_commands import run_git_command
-from completed_scenarios import mark_scenario_completed, is_scenario_completed
+import template_cache
+import workspaces
+import grading
+import check_cache
+import events
+import prefetch
+from git_commands import GitCommandError, Repo, git_trace
 
-HOME_DIR = str(Path.home())
-REPO_PATH = os.path.join(HOME_DIR, "git_learning_repo")
-CURRENT_SCENARIO_FILE = os.path.join(HOME_DIR, ".current_git_scenario")
+workspace_manager = workspaces.WorkspaceManager()
 
 @click.group()
-def cli():
+@click.option('--session', 'session_name', envvar='GIT_LEARN_SESSION', default=workspaces.DEFAULT_SESSION,
+              show_default=True, help="Name of the learner session to work in")
+@click.option('--profile', is_flag=True, help="Profile the command and print the hottest functions and git calls")
+@click.option('--trace-file', type=click.Path(dir_okay=False), help="Write git calls as Chrome trace events to this file")
+@click.pass_context
+def cli(ctx, session_name, profile, trace_file):
     """Git Learning CLI"""
-    pass
-
-def list_scenarios(difficulty=None):
+    try:
+        ctx.obj = workspace_manager.session(session_name)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--session'")
+
+    if profile or trace_file:
+        git_trace.enable()
+    if trace_file:
+        ctx.call_on_close(lambda: git_trace.export_chrome_trace(trace_file))
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        ctx.call_on_close(lambda: print_profile(profiler))
+
+def print_profile(profiler, limit=25):
+    """Print the functions with the most own time, then a summary of git calls, to stderr"""
+    import io
+    import pstats
+
+    profiler.disable()
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('tottime').print_stats(limit)
+    click.echo(stream.getvalue(), err=True)
+    click.echo("git calls by subcommand:", err=True)
+    for subcommand, total in git_trace.summary().items():
+        click.echo(f"  {subcommand:<16} {total['count']:>5} calls {total['seconds']:>9.3f}s "
+                   f"{total['output_bytes']:>10} bytes out {total['failures']:>4} failed", err=True)
+
+def list_scenarios(session, difficulty=None):
     """List all available scenarios"""
+    progress = session.progress().load()
     click.echo("Available scenarios:")
     for idx, scenario in enumerate(SCENARIOS, 1):
         if difficulty is None or scenario.difficulty == difficulty:
-            completed = "✓" if is_scenario_completed(scenario.title) else " "
+            completed = "✓" if progress.get(scenario.title) else " "
             click.echo(f"{idx}. [{completed}] {scenario.title} (Difficulty: {scenario.difficulty})")
 
-def display_scenario_info():
+def display_scenario_info(session):
     """Display detailed information about all scenarios"""
+    progress = session.progress().load()
     for idx, scenario in enumerate(SCENARIOS, 1):
-        completed = "✓" if is_scenario_completed(scenario.title) else " "
+        completed = "✓" if progress.get(scenario.title) else " "
         click.echo(f"\n{idx}. [{completed}] {scenario.title}")
         click.echo(f"   Difficulty: {scenario.difficulty}")
         click.echo(f"   Description: {scenario.description}")
@@ -36,16 +73,18 @@ def display_scenario_info():
         click.echo("   " + "-" * 40)
 
 @cli.command()
-def list():
+@click.pass_obj
+def list(session):
     """List all available scenarios"""
-    display_scenario_info()
+    display_scenario_info(session)
 
 @cli.command()
 @click.argument('scenario', required=False)
-def complete(scenario):
+@click.pass_obj
+def complete(session, scenario):
     """Mark a scenario as completed"""
     if not scenario:
-        list_scenarios()
+        list_scenarios(session)
         scenario_number = click.prompt("Enter the number of the scenario you want to mark as completed", type=int)
         if 1 <= scenario_number <= len(SCENARIOS):
             scenario = SCENARIOS[scenario_number - 1].title
@@ -58,26 +97,18 @@ def complete(scenario):
         click.echo(f"Scenario '{scenario}' not found.")
         return
 
-    mark_scenario_completed(scenario_obj.title)
+    session.progress().mark_completed(scenario_obj.title)
     click.echo(f"Scenario '{scenario_obj.title}' marked as completed.")
 
-def get_current_scenario():
-    if os.path.exists(CURRENT_SCENARIO_FILE):
-        with open(CURRENT_SCENARIO_FILE, 'r') as f:
-            return f.read().strip()
-    return None
-
-def set_current_scenario(scenario_name):
-    with open(CURRENT_SCENARIO_FILE, 'w') as f:
-        f.write(scenario_name)
-
 @cli.command()
 @click.argument('scenario_name', required=False)
-def start_scenario(scenario_name):
+@click.option('--size', help="Size preset for a bigger repository, such as 'medium' or 'large'")
+@click.pass_obj
+def start_scenario(session, scenario_name, size):
     """Start a specific scenario"""
 
     if not scenario_name:
-        list_scenarios()
+        list_scenarios(session)
         scenario_number = click.prompt("Enter the number of the scenario you want to start", type=int)
         if 1 <= scenario_number <= len(SCENARIOS):
             scenario_name = SCENARIOS[scenario_number - 1].title
@@ -90,65 +121,81 @@ def start_scenario(scenario_name):
         click.echo(f"Scenario '{scenario_name}' not found.")
         return
 
-    # Delete the working folder if it exists
-    if os.path.exists(REPO_PATH):
-        shutil.rmtree(REPO_PATH)
-    
-    # Create a new working folder
-    os.mkdir(REPO_PATH)
-
-    # Initialize Git repository and create initial commit
-    try:
-        run_git_command(['init'], REPO_PATH)
-        with open(os.path.join(REPO_PATH, 'README.md'), 'w') as f:
-            f.write("# Git Learning Repository\n\nThis repository is for learning Git commands.\n")
-        run_git_command(['add', 'README.md'], REPO_PATH)
-        run_git_command(['commit', '-m', 'Initial commit'], REPO_PATH)
-    except Exception as e:
-        click.echo(f"Error initializing Git repository: {str(e)}")
-        return
-
+    # Replace the session's repository with a copy of the pre-built scenario
     try:
-        scenario.generate_func(REPO_PATH)
+        workspace_manager.start(session, scenario, size=size)
     except Exception as e:
         click.echo(f"Error generating scenario: {str(e)}")
         return
-
-    set_current_scenario(scenario_name)
+    events.record(session.name, scenario.title, events.STARTED)
+    prefetch.schedule(session)
 
     click.echo(scenario.description)
     click.echo(f"\nYour task: {scenario.task}")
-    click.echo(f"\nThe Git repository has been set up at: {REPO_PATH}")
+    click.echo(f"\nThe Git repository has been set up at: {session.repo_path}")
     click.echo("This is a separate directory in your home folder to avoid conflicts with existing repositories.")
     click.echo("Once you've completed the task, use the 'check' command to verify your solution.")
-    click.echo(f"\nRepo folder location: {REPO_PATH}")
+    click.echo(f"\nRepo folder location: {session.repo_path}")
 
 @cli.command()
 @click.argument('scenario_name', required=False)
-def check(scenario_name):
+@click.pass_obj
+def check(session, scenario_name):
     """Check the solution for a specific scenario"""
-    scenario = get_scenario(scenario_name)
+    scenario = get_scenario(session, scenario_name)
     if not scenario:
         return
 
     click.echo(f"\nCurrent Scenario: {scenario.title}")
     click.echo(f"Description: {scenario.description}")
     click.echo(f"Task: {scenario.task}")
-    click.echo(f"Repo folder location: {REPO_PATH}\n")
+    click.echo(f"Repo folder location: {session.repo_path}\n")
 
-    result = scenario.check_func(REPO_PATH)
+    with Repo(session.repo_path) as repo:
+        result, _ = check_cache.check(repo, scenario)
+    events.record(session.name, scenario.title, events.CHECK_PASSED if result else events.CHECK_FAILED)
 
     if result:
         click.echo("Congratulations! You've successfully completed the task.")
-        mark_scenario_completed(scenario.title)
+        session.progress().mark_completed(scenario.title)
+        prefetch.schedule(session)
     else:
         click.echo("Not quite right. Try again or use the 'hint' command for help.")
 
+@cli.command(name='watch')
+@click.pass_obj
+def watch_command(session):
+    """Check the current scenario again whenever the repository changes"""
+    # Imported here so that other commands don't pay for ctypes
+    import watch
+
+    scenario = get_scenario(session, None)
+    if not scenario:
+        return
+
+    click.echo(f"\nCurrent Scenario: {scenario.title}")
+    click.echo(f"Task: {scenario.task}")
+    click.echo(f"Watching {session.repo_path} for changes. Press Ctrl-C to stop.\n")
+
+    try:
+        with Repo(session.repo_path) as repo:
+            for result in watch.watch_checks(repo, scenario):
+                events.record(session.name, scenario.title, events.CHECK_PASSED if result else events.CHECK_FAILED)
+                timestamp = time.strftime("%H:%M:%S")
+                if result:
+                    click.echo(f"[{timestamp}] Congratulations! You've successfully completed the task.")
+                    session.progress().mark_completed(scenario.title)
+                    return
+                click.echo(f"[{timestamp}] Not quite right yet.")
+    except KeyboardInterrupt:
+        pass
+
 @cli.command()
 @click.argument('scenario_name', required=False)
-def hint(scenario_name):
+@click.pass_obj
+def hint(session, scenario_name):
     """Get hints for a specific scenario"""
-    scenario = get_scenario(scenario_name)
+    scenario = get_scenario(session, scenario_name)
     if not scenario:
         return
 
@@ -159,6 +206,7 @@ def hint(scenario_name):
     hint_index = 0
     while hint_index < len(scenario.hints):
         click.echo(f"Hint {hint_index + 1}: {scenario.hints[hint_index]}")
+        events.record(session.name, scenario.title, events.HINT, hint_index + 1)
         if hint_index < len(scenario.hints) - 1:
             choice = click.prompt("Enter 'n' for next hint or 'q' to quit", type=str).lower()
             if choice == 'q':
@@ -172,9 +220,11 @@ def hint(scenario_name):
         click.echo("No more hints available.")
 
 @cli.command()
-def reset():
+@click.pass_obj
+def reset(session):
     """Reset the current scenario"""
-    scenario_name = get_current_scenario()
+    scenario_name = session.get_current_scenario()
+    scenario = None
     if scenario_name:
         scenario = next((s for s in SCENARIOS if s.title == scenario_name), None)
         if scenario:
@@ -182,18 +232,195 @@ def reset():
             click.echo(f"Description: {scenario.description}")
             click.echo(f"Task: {scenario.task}\n")
 
-    if os.path.exists(REPO_PATH):
-        shutil.rmtree(REPO_PATH)
-        if os.path.exists(CURRENT_SCENARIO_FILE):
-            os.remove(CURRENT_SCENARIO_FILE)
+    if scenario:
+        workspace_manager.reset(session, scenario)
+        events.record(session.name, scenario.title, events.RESET)
+        click.echo(f"The current scenario has been reset. The repository at {session.repo_path} is back to its starting state.")
+    elif os.path.exists(session.repo_path):
+        workspace_manager.clear(session)
         click.echo("The current scenario has been reset. Use the 'start-scenario' command to begin again.")
     else:
         click.echo("No active scenario found. Use the 'start-scenario' command to begin a new scenario.")
 
-def get_scenario(scenario_name):
+@cli.group()
+def cache():
+    """Manage pre-built scenario templates"""
+    pass
+
+@cache.command()
+def warm():
+    """Build templates for every scenario"""
+    template_cache.warm(SCENARIOS)
+    click.echo(f"Scenario templates are ready in {template_cache.CACHE_DIR}")
+
+@cache.command()
+def clear():
+    """Delete all pre-built scenario templates"""
+    template_cache.clear()
+    click.echo("Scenario template cache cleared.")
+
+@cli.group(name='session')
+def session_group():
+    """Manage learner sessions"""
+    pass
+
+@session_group.command(name='list')
+def list_sessions():
+    """List sessions and their current scenarios"""
+    for learner_session in workspace_manager.sessions():
+        current = learner_session.get_current_scenario() or "no active scenario"
+        click.echo(f"{learner_session.name}: {current} ({learner_session.repo_path})")
+
+@session_group.command(name='remove')
+@click.argument('name')
+def remove_session(name):
+    """Delete a session's repository and current scenario"""
+    try:
+        learner_session = workspace_manager.session(name)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'NAME'")
+    workspace_manager.remove(learner_session)
+    click.echo(f"Session '{name}' removed.")
+
+@session_group.command(name='start-many')
+@click.argument('scenario_name')
+@click.argument('names', nargs=-1, required=True)
+@click.option('--workers', type=int, help="Number of scenarios to generate at once")
+def start_many(scenario_name, names, workers):
+    """Start the same scenario in many sessions in parallel"""
+    for name, error in workspace_manager.start_many([(name, scenario_name) for name in names], workers):
+        click.echo(f"{name}: {error or 'ready'}")
+
+@session_group.command(name='export')
+@click.argument('name')
+@click.option('-o', '--output', type=click.File('wb'), default='-', show_default=True,
+              help="File to write the session archive to ('-' for standard output)")
+def export_session(name, output):
+    """Write a session's repository, scenario and progress as a tar stream"""
+    # Imported here so that other commands don't pay for tarfile
+    import session_archive
+
+    try:
+        learner_session = workspace_manager.session(name)
+        session_archive.export_session(learner_session, output)
+    except (ValueError, GitCommandError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Session '{name}' exported.", err=True)
+
+@session_group.command(name='import')
+@click.argument('name')
+@click.argument('archive', type=click.File('rb'), default='-')
+@click.option('--replace', is_flag=True, help="Replace the session if it already exists")
+def import_session(name, archive, replace):
+    """Recreate a session from an archive written by 'session export'"""
+    import session_archive
+
+    try:
+        learner_session = workspace_manager.session(name)
+        metadata = session_archive.import_session(workspace_manager, learner_session, archive, replace=replace)
+    except (ValueError, GitCommandError, workspaces.QuotaExceeded) as e:
+        raise click.ClickException(str(e))
+    current = metadata["scenario"] or "no active scenario"
+    click.echo(f"Session '{name}' imported: {current} ({learner_session.repo_path})", err=True)
+
+@cli.command()
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--scenario', 'scenario_name', help="Scenario to check repositories against when they don't record one")
+@click.option('--jobs', type=int, help="Number of repositories to check at once (default: number of CPUs)")
+@click.option('--timeout', type=float, default=60.0, show_default=True, help="Seconds allowed for each repository")
+def grade(path, scenario_name, jobs, timeout):
+    """Check many learner repositories in parallel.
+
+    PATH is a directory of repositories or a manifest file with one
+    repository per line. Prints one JSON result per repository as it
+    finishes, then a summary line.
+    """
+    submissions = grading.find_submissions(path, scenario_name)
+    start = time.perf_counter()
+    results = []
+    for result in grading.grade(submissions, jobs, timeout):
+        results.append(result)
+        click.echo(json.dumps(result))
+    click.echo(json.dumps({"summary": grading.summarize(results, time.perf_counter() - start)}))
+
+@cli.command()
+@click.option('--json', 'as_json', is_flag=True, help="Print one JSON object per scenario instead of a table")
+def stats(as_json):
+    """Show solve rates, time to solve and hint use across all learners"""
+    scenario_stats = events.scenario_stats()
+    if as_json:
+        for title, scenario_stat in scenario_stats.items():
+            click.echo(json.dumps({"scenario": title, **scenario_stat}))
+        return
+    if not scenario_stats:
+        click.echo(f"No events recorded yet in {events.EVENTS_DIR}.")
+        return
+
+    def show(value, format_spec):
+        return "-" if value is None else format(value, format_spec)
+
+    click.echo(f"{'Scenario':<45} {'Attempts':>8} {'Solved':>7} {'Median':>9} {'Hints':>6} {'Checks':>7} {'Resets':>7}")
+    for title, scenario_stat in scenario_stats.items():
+        median = scenario_stat["median_seconds_to_solve"]
+        median_minutes = "-" if median is None else f"{median / 60:.1f}m"
+        click.echo(f"{title[:45]:<45} {scenario_stat['attempts']:>8} {show(scenario_stat['solve_rate'], '.0%'):>7} "
+                   f"{median_minutes:>9} {show(scenario_stat['mean_hint_depth'], '.1f'):>6} "
+                   f"{scenario_stat['checks']:>7} {scenario_stat['resets']:>7}")
+
+@cli.command(name='replay')
+@click.argument('scenario_names', nargs=-1)
+@click.option('--size', help="Size preset to generate, such as 'medium' (scenarios without it are skipped)")
+@click.option('--jobs', type=int, help="Number of scenarios to replay at once (default: number of CPUs)")
+@click.pass_context
+def replay_command(ctx, scenario_names, size, jobs):
+    """Check every scenario against its reference solution.
+
+    Each variant of each scenario (or of the named SCENARIO_NAMES) is
+    generated, checked unsolved, solved with its scripted solution and
+    checked again, in parallel. Prints one JSON result per replay, then a
+    summary line, and exits with status 1 unless every checker was right.
+    """
+    # Imported here so that other commands don't pay for it
+    import replay
+
+    scenarios = [s for s in SCENARIOS if not scenario_names or s.title in scenario_names]
+    unknown = set(scenario_names) - {s.title for s in scenarios}
+    if unknown:
+        raise click.BadParameter(f"Unknown scenarios: {', '.join(sorted(unknown))}", param_hint="'SCENARIO_NAMES'")
+    if size:
+        scenarios = [s for s in scenarios if size in s.sizes]
+
+    start = time.perf_counter()
+    results = []
+    for result in replay.replay(replay.replay_jobs(scenarios, size), jobs):
+        results.append(result)
+        click.echo(json.dumps(result))
+    summary = replay.summarize(results, time.perf_counter() - start)
+    click.echo(json.dumps({"summary": summary}))
+    if summary["correct"] != summary["replays"]:
+        ctx.exit(1)
+
+@cli.command(name='daemon')
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False),
+              help="Unix socket to listen on (default: ~/.git_learning/daemon.sock or $GIT_LEARN_SOCKET)")
+def daemon_command(socket_path):
+    """Serve commands from a resident process so they start instantly"""
+    # Imported here so that other commands don't pay for socketserver
+    import daemon
+
+    socket_path = socket_path or daemon.SOCKET_PATH
+    click.echo(f"Listening on {socket_path}. Press Ctrl-C to stop.", err=True)
+    try:
+        daemon.serve(socket_path)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
+
+def get_scenario(session, scenario_name):
     """Helper function to get the current scenario"""
     if not scenario_name:
-        scenario_name = get_current_scenario()
+        scenario_name = session.get_current_scenario()
         if not scenario_name:
             click.echo("No active scenario found. Please start a scenario using the 'start-scenario' command first.")
             return None
@@ -203,7 +430,7 @@ def get_scenario(scenario_name):
         click.echo(f"Scenario '{scenario_name}' not found.")
         return None
 
-    if not os.path.exists(REPO_PATH):
+    if not os.path.exists(session.repo_path):
         click.echo("No active scenario found. Please start a scenario first.")
         return None
 
@@ -1,29 +1,203 @@
+import fcntl
 import json
 import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
 HOME_DIR = str(Path.home())
 COMPLETED_SCENARIOS_FILE = os.path.join(HOME_DIR, ".completed_git_scenarios.json")
+PROGRESS_DATABASE = os.environ.get("GIT_LEARN_PROGRESS_DB", os.path.join(HOME_DIR, ".git_learning", "progress.sqlite"))
+# "json" keeps one file per learner, "sqlite" keeps every learner in one database
+PROGRESS_BACKEND = os.environ.get("GIT_LEARN_PROGRESS_BACKEND", "json")
+DEFAULT_LEARNER = "default"
+
+class JsonProgressStore:
+    """Completed scenarios of one learner in a JSON file.
+
+    Reads are served from memory until the file changes on disk. Updates
+    re-read the file under an exclusive lock and replace it atomically, so
+    concurrent writers never lose each other's updates. Updates made inside
+    batch() are written once at the end.
+    """
+
+    def __init__(self, path=COMPLETED_SCENARIOS_FILE):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._cache = None
+        self._stamp = None
+        self._batch = None
+        self._thread_lock = threading.RLock()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        stamp = self._file_stamp()
+        if self._cache is None or stamp != self._stamp:
+            completed = {}
+            if stamp is not None:
+                with open(self.path, 'r') as f:
+                    completed = json.load(f)
+            self._cache, self._stamp = completed, stamp
+        return self._cache
+
+    def _write(self, completed):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, prefix=".completed-", delete=False) as f:
+            json.dump(completed, f)
+        os.replace(f.name, self.path)
+        self._cache, self._stamp = completed, self._file_stamp()
+
+    def load(self):
+        with self._thread_lock:
+            return dict(self._batch if self._batch is not None else self._read())
+
+    def is_completed(self, scenario_name):
+        return self.load().get(scenario_name, False)
+
+    @contextmanager
+    def batch(self):
+        """Hold the file lock and apply every update made inside the block in one write"""
+        with self._thread_lock:
+            if self._batch is not None:
+                yield self._batch
+                return
+            os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+            with open(self.lock_path, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._cache = None
+                self._batch = dict(self._read())
+                try:
+                    yield self._batch
+                    self._write(self._batch)
+                finally:
+                    self._batch = None
+
+    def mark_completed(self, *scenario_names):
+        with self.batch() as completed:
+            for scenario_name in scenario_names:
+                completed[scenario_name] = True
+
+    def save(self, completed):
+        with self.batch() as current:
+            current.clear()
+            current.update(completed)
+
+    def reset(self):
+        with self.batch() as completed:
+            completed.clear()
+
+class SqliteProgressStore:
+    """Completed scenarios of one learner in a SQLite database shared by all learners.
+
+    Results are cached in memory and re-read only when PRAGMA data_version
+    shows another connection has committed since the last read.
+    """
+
+    def __init__(self, learner=DEFAULT_LEARNER, path=PROGRESS_DATABASE):
+        # Imported here so the default JSON backend doesn't pay for it at startup
+        import sqlite3
+
+        self.learner = learner
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS completed ("
+            "learner TEXT NOT NULL, scenario TEXT NOT NULL, completed_at REAL NOT NULL, "
+            "PRIMARY KEY (learner, scenario))")
+        self._cache = None
+        self._version = None
+        self._in_batch = False
+        self._lock = threading.RLock()
+
+    def load(self):
+        with self._lock:
+            version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+            if self._cache is None or version != self._version or self._in_batch:
+                rows = self.connection.execute("SELECT scenario FROM completed WHERE learner = ?", (self.learner,))
+                self._cache = {scenario: True for scenario, in rows}
+                self._version = version
+            return dict(self._cache)
+
+    def is_completed(self, scenario_name):
+        return self.load().get(scenario_name, False)
+
+    @contextmanager
+    def batch(self):
+        """Apply every update made inside the block in one transaction"""
+        with self._lock:
+            if self._in_batch:
+                yield self
+                return
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._in_batch = True
+            try:
+                yield self
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            finally:
+                self._in_batch = False
+                self._cache = None
+
+    def mark_completed(self, *scenario_names):
+        with self.batch():
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO completed (learner, scenario, completed_at) VALUES (?, ?, ?)",
+                [(self.learner, scenario_name, time.time()) for scenario_name in scenario_names])
+
+    def save(self, completed):
+        with self.batch():
+            self.connection.execute("DELETE FROM completed WHERE learner = ?", (self.learner,))
+            self.mark_completed(*(name for name, done in completed.items() if done))
+
+    def reset(self):
+        with self.batch():
+            self.connection.execute("DELETE FROM completed WHERE learner = ?", (self.learner,))
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_progress_store(learner=DEFAULT_LEARNER, json_path=None, backend=None):
+    """Shared progress store for a learner, so its cache lives as long as the process.
+
+    json_path is the learner's file for the JSON backend; the SQLite backend
+    keeps every learner in PROGRESS_DATABASE.
+    """
+    backend = backend or PROGRESS_BACKEND
+    if backend == "sqlite":
+        key = (backend, learner, PROGRESS_DATABASE)
+    elif backend == "json":
+        key = (backend, learner, json_path or COMPLETED_SCENARIOS_FILE)
+    else:
+        raise ValueError(f"Unknown progress backend '{backend}'")
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SqliteProgressStore(learner, key[2]) if backend == "sqlite" else JsonProgressStore(key[2])
+        return _stores[key]
 
 def load_completed_scenarios():
-    if os.path.exists(COMPLETED_SCENARIOS_FILE):
-        with open(COMPLETED_SCENARIOS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return get_progress_store().load()
 
 def save_completed_scenarios(completed):
-    with open(COMPLETED_SCENARIOS_FILE, 'w') as f:
-        json.dump(completed, f)
+    get_progress_store().save(completed)
 
 def mark_scenario_completed(scenario_name):
-    completed = load_completed_scenarios()
-    completed[scenario_name] = True
-    save_completed_scenarios(completed)
+    get_progress_store().mark_completed(scenario_name)
 
 def is_scenario_completed(scenario_name):
-    completed = load_completed_scenarios()
-    return completed.get(scenario_name, False)
+    return get_progress_store().is_completed(scenario_name)
 
 def reset_completed_scenarios():
-    if os.path.exists(COMPLETED_SCENARIOS_FILE):
-        os.remove(COMPLETED_SCENARIOS_FILE)
+    get_progress_store().reset()
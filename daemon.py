@@ -0,0 +1,128 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from pathlib import Path
+
+SOCKET_PATH = os.environ.get("GIT_LEARN_SOCKET", os.path.join(str(Path.home()), ".git_learning", "daemon.sock"))
+# Commands running at once, counting those waiting at a prompt; further clients wait until one finishes
+MAX_COMMANDS = int(os.environ.get("GIT_LEARN_DAEMON_MAX_COMMANDS", 256))
+
+class MessageWriter(io.TextIOBase):
+    """Text stream that sends each write to the client as a {name: text} JSON line"""
+
+    def __init__(self, wfile, name):
+        self.wfile = wfile
+        self.name = name
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        # Refusing bytes tells click this is a text stream
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if text:
+            self.wfile.write(json.dumps({self.name: text}).encode() + b"\n")
+            self.wfile.flush()
+        return len(text)
+
+def run_command(argv, stdin, stdout, stderr):
+    """Run one git-learn command in this process with the given streams and return its exit code.
+
+    The command takes over sys.stdin, sys.stdout and sys.stderr, so the
+    daemon runs each one in a process of its own.
+    """
+    from cli import cli
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        previous_stdin, sys.stdin = sys.stdin, stdin
+        try:
+            cli.main(args=argv, prog_name="git-learn")
+            return 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            stderr.write(f"Error: {e}\n")
+            return 1
+        finally:
+            sys.stdin = previous_stdin
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Runs the command in a JSON request line and streams its output back.
+
+    Output is sent as {"stdout": text} and {"stderr": text} lines and the
+    last line is {"exit_code": n}. Anything else the client sends is the
+    command's standard input, so prompts work as they do in a terminal.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        stdout, stderr = MessageWriter(self.wfile, "stdout"), MessageWriter(self.wfile, "stderr")
+        try:
+            argv = json.loads(line)["argv"]
+        except (ValueError, KeyError, TypeError):
+            stderr.write("Error: malformed request\n")
+            exit_code = 2
+        else:
+            stdin = io.TextIOWrapper(self.rfile, encoding="utf-8")
+            try:
+                exit_code = run_command(argv, stdin, stdout, stderr)
+            finally:
+                # Leave the socket's stream open for StreamRequestHandler to close
+                stdin.detach()
+        self.wfile.write(json.dumps({"exit_code": exit_code}).encode() + b"\n")
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Serves every request in a forked child, which starts with everything the daemon imported.
+
+    A command waiting at a prompt then only holds up its own client.
+    """
+    # Don't let a learner sitting at a prompt keep the daemon from shutting down
+    block_on_close = False
+    max_children = MAX_COMMANDS
+
+def is_running(socket_path=SOCKET_PATH):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt()
+
+def serve(socket_path=SOCKET_PATH):
+    """Load every scenario and the modules commands use, then serve commands until interrupted"""
+    if is_running(socket_path):
+        raise RuntimeError(f"A daemon is already listening on {socket_path}.")
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    if os.path.exists(socket_path):
+        # Left behind by a daemon that didn't shut down cleanly
+        os.unlink(socket_path)
+
+    # Import and load everything a command needs now, so every forked command starts with it
+    import cli
+    import scenarios.model  # noqa: F401
+    for scenario in cli.SCENARIOS:
+        scenario.load()
+    # Progress stores and cat-file sessions stay per command: SQLite connections and pipes can't be shared by forks
+
+    previous_umask = os.umask(0o077)
+    try:
+        server = DaemonServer(socket_path, RequestHandler)
+    finally:
+        os.umask(previous_umask)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
@@ -0,0 +1,215 @@
+import array
+import collections
+import fcntl
+import itertools
+import json
+import mmap
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+EVENTS_DIR = os.environ.get("GIT_LEARN_EVENTS_DIR", os.path.join(str(Path.home()), ".git_learning", "events"))
+# A segment is closed and a new one started once it reaches this size
+SEGMENT_BYTES = int(os.environ.get("GIT_LEARN_EVENT_SEGMENT_BYTES", 16 * 1024 * 1024))
+
+# Every record is four native-endian uint32 columns: time, learner, scenario, event.
+# The event column holds the kind in its low byte and a value (the hint
+# number, say) above it. Learners and scenarios are ids into the dictionary file.
+FIELDS = 4
+RECORD_BYTES = FIELDS * 4
+TIME, LEARNER, SCENARIO, EVENT = range(FIELDS)
+
+STARTED = 1
+CHECK_FAILED = 2
+CHECK_PASSED = 3
+HINT = 4
+RESET = 5
+KIND_MASK = 0xff
+# Events that open, advance or close an attempt
+ATTEMPT_EVENTS = frozenset((STARTED, HINT, CHECK_PASSED))
+
+SEGMENT_NAME = re.compile(r"^events-(\d{6})\.bin$")
+
+class EventLog:
+    """Append-only log of what learners do, in segments of fixed-width records.
+
+    Records are written with a single O_APPEND write each, so concurrent
+    processes can share a log without locking. Names are stored once in a
+    dictionary file, one JSON string per line, and records refer to them by
+    line number.
+    """
+
+    def __init__(self, directory=EVENTS_DIR, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.dictionary_path = os.path.join(directory, "dictionary.jsonl")
+        self._ids = {}
+        self._names = []
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def segments(self):
+        """Segment paths, oldest first"""
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if SEGMENT_NAME.match(name))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _load_dictionary(self, f):
+        f.seek(0)
+        # The last piece is empty, or a line whose write is still in progress
+        for line in f.read().split("\n")[len(self._names):-1]:
+            name = json.loads(line)
+            self._ids.setdefault(name, len(self._names))
+            self._names.append(name)
+
+    def names(self):
+        """Every name in the dictionary, indexed by id"""
+        with self._lock:
+            try:
+                with open(self.dictionary_path, 'r') as f:
+                    self._load_dictionary(f)
+            except FileNotFoundError:
+                pass
+            return list(self._names)
+
+    def name_id(self, name):
+        with self._lock:
+            if name in self._ids:
+                return self._ids[name]
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.dictionary_path, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                self._load_dictionary(f)
+                if name not in self._ids:
+                    f.write(json.dumps(name) + "\n")
+                    self._ids[name] = len(self._names)
+                    self._names.append(name)
+            return self._ids[name]
+
+    def _open_segment(self):
+        segments = self.segments()
+        number = int(SEGMENT_NAME.match(os.path.basename(segments[-1])).group(1)) if segments else 1
+        if segments and os.path.getsize(segments[-1]) >= self.segment_bytes:
+            number += 1
+        path = os.path.join(self.directory, f"events-{number:06d}.bin")
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+
+    def append(self, learner, scenario, kind, value=0, timestamp=None):
+        record = array.array('I', [int(time.time() if timestamp is None else timestamp),
+                                   self.name_id(learner), self.name_id(scenario), kind | value << 8])
+        with self._lock:
+            if self._fd is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._open_segment()
+            elif os.fstat(self._fd).st_size >= self.segment_bytes:
+                # Another process may have rotated already; _open_segment picks up its segment
+                os.close(self._fd)
+                self._open_segment()
+            os.write(self._fd, record.tobytes())
+
+    def columns(self):
+        """Yield (time, learner, scenario, event) column views of each segment.
+
+        The views are uint32 memoryviews straight onto the mapped segment,
+        so scanning a column doesn't build a Python object per record.
+        """
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                # Leave off a record that is still being written
+                size -= size % RECORD_BYTES
+                if not size:
+                    continue
+                with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                    records = memoryview(mapped).cast('I')
+                    columns = tuple(records[field::FIELDS] for field in range(FIELDS))
+                    try:
+                        yield columns
+                    finally:
+                        # The map can only be closed once nothing points into it
+                        for column in columns:
+                            column.release()
+                        records.release()
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def get_event_log(directory=None):
+    """Shared event log, so its dictionary cache and open segment live as long as the process"""
+    directory = directory or EVENTS_DIR
+    with _logs_lock:
+        if directory not in _logs:
+            _logs[directory] = EventLog(directory)
+        return _logs[directory]
+
+def record(learner, scenario, kind, value=0):
+    """Log an event; a log that can't be written never stops the command that caused it"""
+    try:
+        get_event_log().append(learner, scenario, kind, value)
+    except OSError as e:
+        print(f"Warning: could not record event: {e}", file=sys.stderr)
+
+def scenario_stats(log=None):
+    """Solve rate, median time to solve and hint depth of every scenario in the log.
+
+    An attempt runs from a learner starting a scenario to their first
+    passing check; starting it again abandons the attempt. Hint depth is
+    the furthest hint viewed during an attempt. Counts are taken over whole
+    columns with C-level iterators, and only start, hint and passing check
+    events go through the per-attempt bookkeeping in Python.
+    """
+    log = log or get_event_log()
+    counts = collections.Counter()
+    # (learner, scenario) -> [start time, hint depth] of attempts still open
+    open_attempts = {}
+    solve_seconds = collections.defaultdict(list)
+    hint_depths = collections.defaultdict(list)
+    for times, learners, scenarios, events in log.columns():
+        counts.update(zip(scenarios, map(KIND_MASK.__and__, events)))
+        selected = map(ATTEMPT_EVENTS.__contains__, map(KIND_MASK.__and__, events))
+        for i in itertools.compress(range(len(events)), selected):
+            event = events[i]
+            kind = event & KIND_MASK
+            key = (learners[i], scenarios[i])
+            if kind == STARTED:
+                if key in open_attempts:
+                    hint_depths[key[1]].append(open_attempts[key][1])
+                open_attempts[key] = [times[i], 0]
+            elif key in open_attempts:
+                if kind == HINT:
+                    open_attempts[key][1] = max(open_attempts[key][1], event >> 8)
+                else:
+                    started, depth = open_attempts.pop(key)
+                    solve_seconds[key[1]].append(times[i] - started)
+                    hint_depths[key[1]].append(depth)
+    for (_, scenario), (_, depth) in open_attempts.items():
+        hint_depths[scenario].append(depth)
+
+    names = log.names()
+    stats = {}
+    for scenario in sorted({scenario for scenario, _ in counts}):
+        attempts = counts[scenario, STARTED]
+        solved = len(solve_seconds[scenario])
+        stats[names[scenario]] = {
+            "attempts": attempts,
+            "solved": solved,
+            "solve_rate": solved / attempts if attempts else None,
+            "median_seconds_to_solve": statistics.median(solve_seconds[scenario]) if solved else None,
+            "mean_hint_depth": statistics.fmean(hint_depths[scenario]) if hint_depths[scenario] else None,
+            "max_hint_depth": max(hint_depths[scenario], default=None),
+            "checks": counts[scenario, CHECK_FAILED] + counts[scenario, CHECK_PASSED],
+            "resets": counts[scenario, RESET],
+        }
+    return stats
@@ -0,0 +1,146 @@
+import fcntl
+import os
+import shutil
+
+# ioctl request number for FICLONE (reflink a whole file) on Linux
+FICLONE = 0x40049409
+
+def clone_file(src, dst):
+    """Copy src to dst, sharing extents with a reflink where the filesystem allows it."""
+    source = os.open(src, os.O_RDONLY)
+    try:
+        stat = os.fstat(source)
+        target = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.st_mode & 0o7777)
+        try:
+            try:
+                fcntl.ioctl(target, FICLONE, source)
+            except OSError:
+                # No reflinks here: copy in the kernel without reopening either file
+                offset = 0
+                while offset < stat.st_size:
+                    sent = os.sendfile(target, source, offset, stat.st_size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+            os.fchmod(target, stat.st_mode & 0o7777)
+            os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        finally:
+            os.close(target)
+    finally:
+        os.close(source)
+
+def is_object_file(relative_path):
+    """Objects are immutable once written, so they are safe to share between repositories."""
+    return relative_path.startswith(os.path.join('.git', 'objects') + os.sep)
+
+def link_or_clone(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        clone_file(src, dst)
+
+def copy_tree(src, dst, link_objects=True, link_all=False):
+    """Copy a repository directory, hardlinking git objects and cloning everything else.
+
+    With link_all every file is hardlinked, which is only safe when neither
+    copy is ever modified in place.
+    """
+    for root, dirs, files in os.walk(src):
+        relative_root = os.path.relpath(root, src)
+        target_root = os.path.normpath(os.path.join(dst, relative_root))
+        os.makedirs(target_root, exist_ok=True)
+        for name in dirs:
+            path = os.path.join(root, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), os.path.join(target_root, name))
+        for name in files:
+            path = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), target)
+            elif link_all or (link_objects and is_object_file(os.path.normpath(os.path.join(relative_root, name)))):
+                link_or_clone(path, target)
+            else:
+                clone_file(path, target)
+
+def tree_size(path):
+    """Bytes used by the files under path, counting hardlinked files once"""
+    total = 0
+    seen = set()
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if stat.st_nlink > 1:
+                if (stat.st_dev, stat.st_ino) in seen:
+                    continue
+                seen.add((stat.st_dev, stat.st_ino))
+            total += stat.st_size
+    return total
+
+def entry_signature(path):
+    """What a file, symlink or directory looks like on disk; rewriting a file in any way changes it"""
+    stat = os.lstat(path)
+    if os.path.islink(path):
+        return ["link", os.readlink(path)]
+    if os.path.isdir(path):
+        return ["dir"]
+    return ["file", stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_mode]
+
+def stat_manifest(path):
+    """{relative path: signature} of every entry under path"""
+    manifest = {}
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            entry = os.path.join(root, name)
+            manifest[os.path.relpath(entry, path)] = entry_signature(entry)
+    return manifest
+
+def restore_tree(snapshot, dst, manifest):
+    """Make dst identical to snapshot again, rewriting only entries that changed.
+
+    manifest is stat_manifest(dst) from when dst last matched snapshot.
+    Entries whose signature still matches are left alone, anything new is
+    removed and anything changed or missing is cloned back from snapshot.
+    Returns the updated manifest and the number of entries rewritten.
+    """
+    os.makedirs(dst, exist_ok=True)
+    stale = []
+    for root, dirs, files in os.walk(dst):
+        for name in list(dirs):
+            entry = os.path.join(root, name)
+            relative_path = os.path.relpath(entry, dst)
+            if manifest.get(relative_path) != ["dir"] or os.path.islink(entry):
+                stale.append(entry)
+                dirs.remove(name)
+        for name in files:
+            entry = os.path.join(root, name)
+            if manifest.get(os.path.relpath(entry, dst)) != entry_signature(entry):
+                stale.append(entry)
+    for entry in stale:
+        if os.path.isdir(entry) and not os.path.islink(entry):
+            shutil.rmtree(entry)
+        else:
+            os.unlink(entry)
+
+    manifest = dict(manifest)
+    rewritten = 0
+    # Sorted so parent directories come before their contents
+    for relative_path in sorted(manifest, key=lambda p: p.split(os.sep)):
+        target = os.path.join(dst, relative_path)
+        if os.path.lexists(target):
+            continue
+        source = os.path.join(snapshot, relative_path)
+        if os.path.islink(source):
+            os.symlink(os.readlink(source), target)
+        elif os.path.isdir(source):
+            os.makedirs(target)
+        elif is_object_file(relative_path):
+            link_or_clone(source, target)
+        else:
+            clone_file(source, target)
+        manifest[relative_path] = entry_signature(target)
+        rewritten += 1
+    return manifest, rewritten
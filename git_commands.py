@@ -1,9 +1,656 @@
+import json
+import os
+import random
+import signal
 import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import odb
+from odb import parse_commit, parse_tree
 
-def run_git_command(command, repo_path=None):
-    if repo_path:
-        command = ["-C", repo_path] + command
-    result = subprocess.run(["git"] + command, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"Git command failed: {result.stderr}")
-    return result.stdout.strip()
+# 2024-01-01T00:00:00Z, the default start of the synthetic commit clock
+DEFAULT_EPOCH = 1704067200
+
+# Seconds any one git command may take unless the call asks otherwise; 0 means no limit
+DEFAULT_TIMEOUT = float(os.environ.get("GIT_LEARN_GIT_TIMEOUT", 600)) or None
+# Short-lived git processes running at once in this process; further calls queue for a slot
+MAX_GIT_PROCESSES = int(os.environ.get("GIT_LEARN_MAX_GIT_PROCESSES", 4 * (os.cpu_count() or 1)))
+
+# Nothing git-learn runs may wait for an editor, a password prompt or a pager
+NONINTERACTIVE_ENV = {
+    "GIT_EDITOR": "true",
+    "GIT_SEQUENCE_EDITOR": "true",
+    "GIT_MERGE_AUTOEDIT": "no",
+    "GIT_TERMINAL_PROMPT": "0",
+    "GIT_PAGER": "cat",
+}
+
+class GitCommandError(Exception):
+    pass
+
+class GitTimeout(GitCommandError):
+    pass
+
+def git_env(env):
+    """Environment for a git subprocess: os.environ, made non-interactive, with env applied on top"""
+    return {**os.environ, **NONINTERACTIVE_ENV, **(env or {})}
+
+_git_processes = threading.BoundedSemaphore(MAX_GIT_PROCESSES)
+_deadlines = threading.local()
+
+@contextmanager
+def git_deadline(seconds):
+    """Make every git command this thread runs inside the block finish within seconds in total"""
+    previous = getattr(_deadlines, "deadline", None)
+    deadline = time.monotonic() + seconds
+    _deadlines.deadline = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _deadlines.deadline = previous
+
+def call_timeout(timeout=None):
+    """Seconds a git command may take: timeout (or DEFAULT_TIMEOUT), cut short by any git_deadline()"""
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    deadline = getattr(_deadlines, "deadline", None)
+    if deadline is not None:
+        remaining = max(0.0, deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+def kill_process_group(process):
+    """Kill a process started with start_new_session=True and everything it started"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+class GitTrace:
+    """Opt-in record of every git process started through this module.
+
+    Enabled by setting GIT_LEARN_TRACE=1 or calling enable(). Each event
+    holds the argv, start offset, duration, exit code and output size, and
+    can be summarized by subcommand or exported as Chrome trace events
+    (viewable in chrome://tracing or Perfetto).
+    """
+
+    def __init__(self):
+        self.enabled = bool(os.environ.get("GIT_LEARN_TRACE"))
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def clear(self):
+        with self.lock:
+            self.events = []
+            self.origin = time.perf_counter()
+
+    def record(self, argv, started, returncode, output_bytes):
+        if not self.enabled:
+            return
+        event = {
+            "argv": argv,
+            "subcommand": git_subcommand(argv),
+            "start": started - self.origin,
+            "duration": time.perf_counter() - started,
+            "returncode": returncode,
+            "output_bytes": output_bytes,
+            "thread": threading.get_ident(),
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def summary(self):
+        """Count, total seconds, failures and output bytes per git subcommand, slowest first"""
+        totals = {}
+        with self.lock:
+            for event in self.events:
+                total = totals.setdefault(event["subcommand"], {"count": 0, "seconds": 0.0, "failures": 0, "output_bytes": 0})
+                total["count"] += 1
+                total["seconds"] += event["duration"]
+                total["failures"] += event["returncode"] != 0
+                total["output_bytes"] += event["output_bytes"]
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["seconds"]))
+
+    def export_chrome_trace(self, path):
+        with self.lock:
+            trace_events = [{
+                "name": event["subcommand"],
+                "cat": "git",
+                "ph": "X",
+                "ts": round(event["start"] * 1e6),
+                "dur": round(event["duration"] * 1e6),
+                "pid": os.getpid(),
+                "tid": event["thread"],
+                "args": {"argv": event["argv"], "returncode": event["returncode"], "output_bytes": event["output_bytes"]},
+            } for event in self.events]
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+git_trace = GitTrace()
+
+def git_subcommand(argv):
+    """The git subcommand in argv, skipping global options such as -C <path>"""
+    arguments = iter(argv[1:])
+    for argument in arguments:
+        if argument in ("-C", "-c"):
+            next(arguments, None)
+        elif not argument.startswith("-"):
+            return argument
+    return argv[-1] if len(argv) > 1 else "git"
+
+def run_git_command(command, repo_path=None, env=None, text=True, timeout=None, input=None):
+    """Run git and return its output, raising GitCommandError if it fails.
+
+    The command gets at most timeout seconds (DEFAULT_TIMEOUT when None),
+    including any wait for one of the MAX_GIT_PROCESSES slots. Past that,
+    git and every process it started are killed and GitTimeout is raised.
+    input, if given, is written to git's standard input.
+    """
+    argv = ["git"] + (["-C", repo_path] if repo_path else []) + command
+    timeout = call_timeout(timeout)
+    queued = time.monotonic()
+    if not _git_processes.acquire(timeout=timeout):
+        raise GitTimeout(f"Git command timed out after {timeout} seconds waiting for a free slot: {' '.join(argv)}")
+    try:
+        if timeout is not None:
+            timeout = max(0.0, timeout - (time.monotonic() - queued))
+        started = time.perf_counter()
+        # A session of its own, so a timeout also kills hooks, pagers and helpers git started
+        process = subprocess.Popen(argv, stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=text, env=git_env(env), start_new_session=True)
+        try:
+            stdout, stderr = process.communicate(input=input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_group(process)
+            process.communicate()
+            git_trace.record(argv, started, process.returncode, 0)
+            raise GitTimeout(f"Git command timed out after {time.perf_counter() - started:.1f} seconds: {' '.join(argv)}")
+        except BaseException:
+            # Interrupted, e.g. by Ctrl-C or a grading alarm; don't leave git running
+            kill_process_group(process)
+            process.wait()
+            raise
+    finally:
+        _git_processes.release()
+    git_trace.record(argv, started, process.returncode, len(stdout))
+    if process.returncode != 0:
+        stderr = stderr if text else stderr.decode(errors="replace")
+        raise GitCommandError(f"Git command failed: {stderr}")
+    return stdout.strip() if text else stdout
+
+class Repo:
+    """A repository that generators and checkers operate on.
+
+    Holds the repository path, extra environment variables for every git
+    call, and a cat-file session that is started on first use. Nothing
+    depends on the process working directory, so any number of Repo
+    objects can be used from different threads at the same time.
+    """
+
+    def __init__(self, path, env=None):
+        self.path = os.path.abspath(path)
+        self.env = dict(env or {})
+        self._reader = None
+        self._reader_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Repo({self.path!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self, command, env=None, text=True, timeout=None, input=None):
+        return run_git_command(command, self.path, env={**self.env, **(env or {})}, text=text, timeout=timeout,
+                               input=input)
+
+    def file(self, relative_path):
+        """Absolute path of a file in the working tree"""
+        return os.path.join(self.path, relative_path)
+
+    @property
+    def reader(self):
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = ObjectReader(self.path, env=self.env)
+            return self._reader
+
+    def close(self):
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+class CommitClock:
+    """Deterministic source of commit timestamps.
+
+    Each call to env() advances the clock and returns GIT_AUTHOR_DATE and
+    GIT_COMMITTER_DATE values for the next commit, so history gets strictly
+    ordered timestamps without waiting on the wall clock. With a seed the
+    start time and the gaps between commits are randomized reproducibly.
+    """
+
+    def __init__(self, start=None, step=60, seed=None):
+        self.step = step
+        self.random = random.Random(seed) if seed is not None else None
+        if start is None:
+            start = DEFAULT_EPOCH
+            if self.random:
+                start += self.random.randrange(24 * 60 * 60)
+        self.current = start
+
+    @classmethod
+    def after(cls, repo, ref="HEAD", **kwargs):
+        """Start a clock just after the commit time of an existing ref."""
+        timestamp = repo.run(["log", "-1", "--format=%ct", ref])
+        return cls(start=int(timestamp), **kwargs)
+
+    def tick(self):
+        if self.random:
+            self.current += self.random.randint(1, 2 * self.step)
+        else:
+            self.current += self.step
+        return self.current
+
+    def timestamp(self):
+        return f"{self.tick()} +0000"
+
+    def env(self):
+        date = f"@{self.timestamp()}"
+        return {"GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+
+Blob = namedtuple("Blob", ["mark"])
+
+DEFAULT_IDENT = "Git Learner <learner@example.com>"
+
+# Configuration scenario generation runs with instead of the user's. Hooks, signing,
+# credential helpers, fsync and automatic gc only cost time on throwaway history,
+# and a fixed identity and branch name make generated history the same for everyone.
+GENERATION_CONFIG = {
+    "user.name": "Git Learner",
+    "user.email": "learner@example.com",
+    "init.defaultBranch": "main",
+    "core.hooksPath": os.devnull,
+    "core.excludesFile": os.devnull,
+    "core.attributesFile": os.devnull,
+    "core.autocrlf": "false",
+    "core.fsync": "none",
+    "core.fsyncObjectFiles": "false",
+    "gc.auto": "0",
+    "maintenance.auto": "false",
+    "commit.gpgSign": "false",
+    "tag.gpgSign": "false",
+    "credential.helper": "",
+    "advice.detachedHead": "false",
+}
+
+def generation_env():
+    """Environment that hides system and global git config and applies GENERATION_CONFIG instead"""
+    env = {"GIT_CONFIG_NOSYSTEM": "1", "GIT_CONFIG_GLOBAL": os.devnull, "GIT_CONFIG_COUNT": str(len(GENERATION_CONFIG))}
+    for i, (key, value) in enumerate(GENERATION_CONFIG.items()):
+        env[f"GIT_CONFIG_KEY_{i}"] = key
+        env[f"GIT_CONFIG_VALUE_{i}"] = value
+    return env
+
+# Blobs larger than this are streamed into packs whole instead of being held in memory for delta compression
+BIG_FILE_THRESHOLD = "16m"
+
+class HistoryBuilder:
+    """Build scenario history with a single git fast-import process.
+
+    Generators describe commits with commit() and branches with branch(),
+    and everything is streamed to fast-import as it is described. Files
+    are given as a {path: content} mapping, where content is a str, bytes,
+    or a Blob returned by blob() or blob_stream() so large binary content
+    is only sent once. finish() waits for the import and checks out the
+    requested ref. Without export_marks, commit ids aren't collected, which
+    keeps memory flat for very long histories. compression overrides the
+    zlib level (0-9) of the objects written.
+    """
+
+    def __init__(self, repo, clock=None, export_marks=True, compression=None):
+        self.repo = repo
+        self.clock = clock or CommitClock.after(repo)
+        self.ident = self._committer_ident()
+        self.tips = {}
+        self.shas = {}
+        self.temporary_refs = []
+        self.last_mark = 0
+        self.marks_file = None
+        self.errors = tempfile.TemporaryFile()
+        # fast-import explodes small imports into loose objects unless told otherwise; keep its pack as it is
+        self.argv = ["git", "-C", repo.path, "-c", "fastimport.unpackLimit=0"]
+        if compression is not None:
+            self.argv += ["-c", f"core.compression={compression}"]
+        self.argv += ["fast-import", "--quiet", "--done", f"--big-file-threshold={BIG_FILE_THRESHOLD}"]
+        if export_marks:
+            self.marks_file = tempfile.NamedTemporaryFile(prefix="git-learn-marks-", delete=False)
+            self.marks_file.close()
+            self.argv.append(f"--export-marks={self.marks_file.name}")
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(self.argv, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                        stderr=self.errors, env=git_env(repo.env), start_new_session=True)
+
+    def _committer_ident(self):
+        try:
+            ident = self.repo.run(["var", "GIT_COMMITTER_IDENT"])
+        except GitCommandError:
+            return DEFAULT_IDENT
+        return ident.rsplit(" ", 2)[0]
+
+    def _write(self, *chunks):
+        for chunk in chunks:
+            self.process.stdin.write(chunk.encode() if isinstance(chunk, str) else chunk)
+
+    def _data(self, content):
+        if isinstance(content, str):
+            content = content.encode()
+        self._write(f"data {len(content)}\n", content, "\n")
+
+    def _mark(self):
+        self.last_mark += 1
+        return self.last_mark
+
+    def _ref(self, name):
+        return name if name.startswith("refs/") else f"refs/heads/{name}"
+
+    def _committish(self, start):
+        if isinstance(start, int):
+            return f":{start}"
+        if start in self.tips:
+            return self.tips[start]
+        if start == "HEAD" or any(c in start for c in "/~^:@"):
+            return start
+        return f"{self._ref(start)}^0"
+
+    def blob(self, content):
+        mark = self._mark()
+        self._write("blob\n", f"mark :{mark}\n")
+        self._data(content)
+        return Blob(mark)
+
+    def blob_stream(self, size, chunks):
+        """Stream a blob of size bytes from an iterable of bytes chunks, so it never has to fit in memory"""
+        mark = self._mark()
+        self._write("blob\n", f"mark :{mark}\n", f"data {size}\n")
+        written = 0
+        for chunk in chunks:
+            self._write(chunk)
+            written += len(chunk)
+        if written != size:
+            raise ValueError(f"Blob stream produced {written} bytes instead of {size}")
+        self._write("\n")
+        return Blob(mark)
+
+    def branch(self, name, start="main", temporary=False):
+        """Create or move a branch to start: a branch name, mark or ref expression."""
+        committish = self._committish(start)
+        self._write(f"reset {self._ref(name)}\n", f"from {committish}\n\n")
+        self.tips[name] = committish
+        if temporary:
+            self.temporary_refs.append(self._ref(name))
+
+    def commit(self, message, files=None, delete=(), branch="main"):
+        """Commit files on branch and return the commit's mark.
+
+        files is a {path: content} mapping or an iterable of (path, content)
+        pairs, which lets very wide trees be streamed without building a dict.
+        """
+        parent = self._committish(branch)
+        mark = self._mark()
+        self._write(f"commit {self._ref(branch)}\n", f"mark :{mark}\n",
+                    f"committer {self.ident} {self.clock.timestamp()}\n")
+        self._data(message)
+        self._write(f"from {parent}\n")
+        for path in delete:
+            self._write(f"D {path}\n")
+        for path, content in (files.items() if isinstance(files, dict) else files or ()):
+            if isinstance(content, Blob):
+                self._write(f"M 100644 :{content.mark} {path}\n")
+            else:
+                self._write(f"M 100644 inline {path}\n")
+                self._data(content)
+        self._write("\n")
+        self.tips[branch] = f":{mark}"
+        return mark
+
+    def finish(self, checkout="main", detach=False):
+        """Complete the import, then check out checkout and drop temporary refs."""
+        self._write("done\n")
+        self.process.stdin.close()
+        timeout, timed_out = call_timeout(), False
+        try:
+            returncode = self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_group(self.process)
+            returncode, timed_out = self.process.wait(), True
+        git_trace.record(self.argv, self.started, returncode, 0)
+        try:
+            if timed_out:
+                raise GitTimeout(f"Git command timed out after {timeout} seconds: {' '.join(self.argv)}")
+            if returncode != 0:
+                self.errors.seek(0)
+                raise GitCommandError(f"Git command failed: {self.errors.read().decode(errors='replace')}")
+            if self.marks_file:
+                with open(self.marks_file.name) as f:
+                    for line in f:
+                        mark, sha = line.split()
+                        self.shas[int(mark[1:])] = sha
+        finally:
+            self.errors.close()
+            if self.marks_file:
+                os.unlink(self.marks_file.name)
+
+        if checkout is not None:
+            target = self.shas[checkout] if isinstance(checkout, int) else checkout
+            self.repo.run(["checkout", "-f"] + (["--detach"] if detach else []) + [target])
+        for ref in self.temporary_refs:
+            self.repo.run(["update-ref", "-d", ref])
+        return self.shas
+
+class BaseObjectReader:
+    """Tree and commit parsing on top of a read() method"""
+
+    def read_tree(self, name):
+        """Entries of a tree as (mode, name, id) tuples"""
+        object_type, data = self.read(name)
+        if object_type != "tree":
+            return None
+        return parse_tree(data)
+
+    def read_commit(self, name):
+        """Headers of a commit as a dict with 'tree', 'parents', 'committer_time' and 'message'"""
+        object_type, data = self.read(name)
+        if object_type != "commit":
+            return None
+        return parse_commit(data)
+
+class GitObjectReader(BaseObjectReader):
+    """Long-lived git cat-file session for reading objects from one repository.
+
+    Names (refs, "<ref>:<path>" expressions or object ids) are resolved
+    through a git cat-file --batch-check process and object contents are
+    read through a git cat-file --batch process, both started on first use
+    and kept open until close(). Objects are immutable, so their contents
+    are cached by id; names are resolved again on every call because refs
+    can move between reads.
+    """
+
+    def __init__(self, repo_path, env=None, cache_bytes=64 * 1024 * 1024):
+        self.repo_path = repo_path
+        self.env = env
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self.objects = OrderedDict()
+        self.processes = {}
+        self.lock = threading.Lock()
+
+    def _process(self, mode):
+        process = self.processes.get(mode)
+        if process is None or process.poll() is not None:
+            argv = ["git", "-C", self.repo_path, "cat-file", mode]
+            process = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, env=git_env(self.env), start_new_session=True)
+            process.trace = {"argv": argv, "started": time.perf_counter(), "output_bytes": 0}
+            self.processes[mode] = process
+        return process
+
+    def _request(self, mode, name):
+        if "\n" in name:
+            return None, None, None
+        process = self._process(mode)
+        process.stdin.write(name.encode() + b"\n")
+        process.stdin.flush()
+        header = process.stdout.readline().decode()
+        process.trace["output_bytes"] += len(header)
+        if not header:
+            raise GitCommandError(f"Git command failed: cat-file {mode} exited while reading {name}")
+        fields = header.split()
+        if len(fields) != 3:
+            # "<name> missing" or "<name> ambiguous"
+            return None, None, None
+        sha, object_type, size = fields
+        data = None
+        if mode == "--batch":
+            data = process.stdout.read(int(size))
+            process.stdout.read(1)
+            process.trace["output_bytes"] += len(data) + 1
+        return sha, object_type, data
+
+    def _remember(self, sha, object_type, data):
+        self.objects[sha] = (object_type, data)
+        self.cached_bytes += len(data)
+        while self.cached_bytes > self.cache_bytes and len(self.objects) > 1:
+            _, (_, evicted) = self.objects.popitem(last=False)
+            self.cached_bytes -= len(evicted)
+
+    def resolve(self, name):
+        """Object id that name refers to, or None if it doesn't exist"""
+        with self.lock:
+            return self._request("--batch-check", name)[0]
+
+    def read(self, name):
+        """(type, content) of the object name refers to, or (None, None) if it doesn't exist"""
+        with self.lock:
+            if name in self.objects:
+                self.objects.move_to_end(name)
+                return self.objects[name]
+            sha, object_type, data = self._request("--batch", name)
+            if sha is None:
+                return None, None
+            self._remember(sha, object_type, data)
+            return object_type, data
+
+    def close(self):
+        with self.lock:
+            for process in self.processes.values():
+                if process.poll() is None:
+                    process.stdin.close()
+                    process.wait()
+                git_trace.record(process.trace["argv"], process.trace["started"], process.returncode,
+                                 process.trace["output_bytes"])
+            self.processes.clear()
+
+# Any of these redirect git away from the repository layout odb reads directly
+REDIRECTING_VARIABLES = ("GIT_DIR", "GIT_COMMON_DIR", "GIT_OBJECT_DIRECTORY", "GIT_ALTERNATE_OBJECT_DIRECTORIES")
+
+class ObjectReader(BaseObjectReader):
+    """Reads refs and objects in process with odb, falling back to git.
+
+    Most checker queries (HEAD, branches, "<ref>:<path>", commits and
+    trees) are answered without starting a process. Whatever odb doesn't
+    support is passed to a GitObjectReader, whose cat-file processes only
+    start if that ever happens.
+    """
+
+    def __init__(self, repo_path, env=None):
+        self.repo_path = repo_path
+        self.env = env
+        self.git = GitObjectReader(repo_path, env=env)
+        self.odb = None
+        if not any(name in {**os.environ, **(env or {})} for name in REDIRECTING_VARIABLES):
+            try:
+                self.odb = odb.ObjectDatabase(repo_path)
+            except odb.Unsupported:
+                pass
+
+    def resolve(self, name):
+        """Object id that name refers to, or None if it doesn't exist"""
+        if self.odb:
+            try:
+                return self.odb.resolve(name)
+            except odb.Unsupported:
+                pass
+        return self.git.resolve(name)
+
+    def read(self, name):
+        """(type, content) of the object name refers to, or (None, None) if it doesn't exist"""
+        if self.odb:
+            try:
+                object_id = self.odb.resolve(name)
+                return self.odb.read(object_id) if object_id else (None, None)
+            except odb.Unsupported:
+                pass
+        return self.git.read(name)
+
+    def current_branch(self):
+        """Name of the checked out branch, or None when HEAD is detached"""
+        if self.odb:
+            try:
+                ref = self.odb.head()[0]
+                return ref[len("refs/heads/"):] if ref and ref.startswith("refs/heads/") else None
+            except odb.Unsupported:
+                pass
+        try:
+            return run_git_command(["symbolic-ref", "--quiet", "--short", "HEAD"], self.repo_path, env=self.env)
+        except GitCommandError:
+            return None
+
+    def branches(self):
+        """Names of all local branches"""
+        if self.odb:
+            try:
+                return [ref[len("refs/heads/"):] for ref in self.odb.refs("refs/heads/")]
+            except odb.Unsupported:
+                pass
+        output = run_git_command(["for-each-ref", "--format=%(refname:short)", "refs/heads"], self.repo_path, env=self.env)
+        return output.split("\n") if output else []
+
+    def refs(self):
+        """{ref name: object id} for every ref, with HEAD mapped to its branch ref or, when detached, its commit"""
+        if self.odb:
+            try:
+                refs = self.odb.refs()
+                branch, object_id = self.odb.head()
+                refs["HEAD"] = branch or object_id
+                return refs
+            except odb.Unsupported:
+                pass
+        output = run_git_command(["for-each-ref", "--format=%(refname) %(objectname)"], self.repo_path, env=self.env)
+        refs = dict(line.split(" ", 1) for line in output.split("\n") if line)
+        try:
+            refs["HEAD"] = run_git_command(["symbolic-ref", "--quiet", "HEAD"], self.repo_path, env=self.env)
+        except GitCommandError:
+            refs["HEAD"] = run_git_command(["rev-parse", "HEAD"], self.repo_path, env=self.env)
+        return refs
+
+    def git_dir(self):
+        """Absolute path of the repository's git directory"""
+        if self.odb:
+            return self.odb.git_dir
+        return run_git_command(["rev-parse", "--absolute-git-dir"], self.repo_path, env=self.env)
+
+    def close(self):
+        self.git.close()
+        if self.odb:
+            self.odb.close()
@@ -0,0 +1,66 @@
+# git_learn_client.py
+#
+# Entry point for git-learn. Forwards quick commands to a running
+# 'git-learn daemon' over its Unix socket, so they skip interpreter-level
+# imports, and runs everything else (or everything, when no daemon is
+# running) in this process. Keep the imports here to the standard library.
+
+import json
+import os
+import socket
+import sys
+import threading
+
+SOCKET_PATH = os.environ.get("GIT_LEARN_SOCKET", os.path.join(os.path.expanduser("~"), ".git_learning", "daemon.sock"))
+FORWARDED_COMMANDS = ('list', 'check', 'hint', 'start-scenario', 'complete', 'reset', 'stats')
+
+def _copy_stdin(client):
+    """Pass our standard input to the command, then tell it there is no more"""
+    # Raw reads, so the interpreter can exit while this thread waits for input
+    try:
+        while True:
+            chunk = os.read(sys.stdin.fileno(), 65536)
+            if not chunk:
+                break
+            client.sendall(chunk)
+        client.shutdown(socket.SHUT_WR)
+    except (OSError, ValueError):
+        pass
+
+def forward(argv, socket_path=SOCKET_PATH):
+    """Run argv in the daemon, printing its output as it arrives, and return its exit code.
+
+    Returns None if no daemon is listening.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    with client, client.makefile('rb') as responses:
+        client.sendall(json.dumps({"argv": argv}).encode() + b"\n")
+        threading.Thread(target=_copy_stdin, args=(client,), daemon=True).start()
+        for line in responses:
+            message = json.loads(line)
+            if "exit_code" in message:
+                return message["exit_code"]
+            stream = sys.stdout if "stdout" in message else sys.stderr
+            stream.write(message.get("stdout", message.get("stderr")))
+            stream.flush()
+    return 1
+
+def main():
+    argv = sys.argv[1:]
+    # Global options such as --profile need the command to run in this process
+    if argv and argv[0] in FORWARDED_COMMANDS:
+        session = os.environ.get("GIT_LEARN_SESSION")
+        exit_code = forward(["--session", session] + argv if session else argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    from cli import cli
+    cli(prog_name="git-learn")
+
+if __name__ == '__main__':
+    main()
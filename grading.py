@@ -0,0 +1,105 @@
+import json
+import os
+import signal
+import time
+from contextlib import nullcontext
+from git_commands import git_deadline, GitTimeout, Repo
+import check_cache
+from template_cache import SCENARIO_MARKER
+
+class GradingTimeout(Exception):
+    pass
+
+def read_marker(repo_path):
+    try:
+        with open(os.path.join(repo_path, SCENARIO_MARKER), 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def find_submissions(path, scenario_name=None):
+    """(repo path, scenario title) pairs from a directory of repositories or a manifest file.
+
+    A manifest has one submission per line, either as a JSON object with
+    "repo" and optional "scenario" keys or as a plain repository path.
+    Relative paths are resolved against the manifest's directory.
+    """
+    submissions = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            repo_path = os.path.join(path, name)
+            if os.path.isdir(os.path.join(repo_path, ".git")):
+                submissions.append((repo_path, scenario_name))
+        return submissions
+
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                repo_path, title = entry['repo'], entry.get('scenario', scenario_name)
+            else:
+                repo_path, title = line, scenario_name
+            submissions.append((os.path.join(base, repo_path), title))
+    return submissions
+
+def _raise_timeout(signum, frame):
+    raise GradingTimeout()
+
+def grade_repo(repo_path, scenario_name=None, timeout=None):
+    """Run the scenario's checker on one repository and return a result record.
+
+    With a timeout, every git command the check runs shares that budget,
+    and an alarm stops checks that spend it outside git.
+    """
+    from scenarios import SCENARIOS
+
+    result = {"repo": repo_path, "scenario": scenario_name or read_marker(repo_path),
+              "passed": False, "cached": False, "error": None, "seconds": 0.0}
+    scenario = next((s for s in SCENARIOS if s.title == result["scenario"]), None)
+    if not scenario:
+        result["error"] = f"Scenario '{result['scenario']}' not found." if result["scenario"] else "Unknown scenario."
+        return result
+
+    if timeout:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        with git_deadline(timeout) if timeout else nullcontext(), Repo(repo_path) as repo:
+            result["passed"], result["cached"] = check_cache.check(repo, scenario)
+    except (GradingTimeout, GitTimeout):
+        result["error"] = f"Timed out after {timeout} seconds."
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+def grade(submissions, max_workers=None, timeout=None):
+    """Grade (repo path, scenario title) pairs in a process pool, yielding results as they finish"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        futures = [pool.submit(grade_repo, repo_path, title, timeout) for repo_path, title in submissions]
+        for future in as_completed(futures):
+            yield future.result()
+
+def summarize(results, wall_seconds):
+    summary = {"repos": len(results), "passed": 0, "failed": 0, "errors": 0,
+               "wall_seconds": round(wall_seconds, 3),
+               "check_seconds": round(sum(r["seconds"] for r in results), 3)}
+    for result in results:
+        if result["error"]:
+            summary["errors"] += 1
+        elif result["passed"]:
+            summary["passed"] += 1
+        else:
+            summary["failed"] += 1
+    return summary
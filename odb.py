@@ -0,0 +1,446 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+# Names that can only be refs: anything git could read as an abbreviated or described object id is left to git
+PLAIN_NAME = re.compile(r"^[A-Za-z0-9_.][A-Za-z0-9_./-]*$")
+OBJECT_ID_LIKE = re.compile(r"^[0-9a-f]{4,40}$|-g[0-9a-f]{4,}$")
+# Only names like these are looked up as files directly under the git dir; "index" or "config" never are
+PSEUDO_REF = re.compile(r"^[A-Z_]+$")
+# A loose ref holds an object id, which may be followed by more text (FETCH_HEAD has one per line)
+LOOSE_REF = re.compile(rb"^([0-9a-f]{40})(?:\s|$)")
+
+class Unsupported(Exception):
+    """The repository or query needs a feature this module doesn't implement; ask git instead"""
+
+def parse_tree(data):
+    """Entries of a raw tree object as (mode, name, id) tuples"""
+    entries = []
+    position = 0
+    while position < len(data):
+        space = data.index(b" ", position)
+        null = data.index(b"\0", space)
+        entries.append((data[position:space].decode(), data[space + 1:null].decode(errors="surrogateescape"),
+                        data[null + 1:null + 21].hex()))
+        position = null + 21
+    return entries
+
+def parse_commit(data):
+    """Headers of a raw commit object as a dict with 'tree', 'parents', 'committer_time' and 'message'"""
+    headers, _, message = data.decode(errors="replace").partition("\n\n")
+    commit = {"tree": None, "parents": [], "committer_time": 0, "message": message}
+    for line in headers.split("\n"):
+        key, _, value = line.partition(" ")
+        if key == "tree":
+            commit["tree"] = value
+        elif key == "parent":
+            commit["parents"].append(value)
+        elif key == "committer":
+            commit["committer_time"] = int(value.rsplit(" ", 2)[1])
+    return commit
+
+def apply_delta(base, delta):
+    """Rebuild an object from its base and a git delta"""
+    def varint(position):
+        value = shift = 0
+        while True:
+            byte = delta[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value, position
+
+    base_size, position = varint(0)
+    result_size, position = varint(position)
+    if base_size != len(base):
+        raise Unsupported("delta base size mismatch")
+    result = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            offset = size = 0
+            for bit in range(4):
+                if opcode & (1 << bit):
+                    offset |= delta[position] << (8 * bit)
+                    position += 1
+            for bit in range(3):
+                if opcode & (0x10 << bit):
+                    size |= delta[position] << (8 * bit)
+                    position += 1
+            result += base[offset:offset + (size or 0x10000)]
+        elif opcode:
+            result += delta[position:position + opcode]
+            position += opcode
+        else:
+            raise Unsupported("reserved delta opcode")
+    if len(result) != result_size:
+        raise Unsupported("delta result size mismatch")
+    return bytes(result)
+
+class Pack:
+    """A packfile and its version 2 index, both read through mmap"""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.pack_path = index_path[:-4] + ".pack"
+        with open(index_path, 'rb') as f:
+            self.index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index[:4] != b"\xfftOc" or struct.unpack(">I", self.index[4:8])[0] != 2:
+            self.index.close()
+            raise Unsupported(f"unsupported pack index {index_path}")
+        with open(self.pack_path, 'rb') as f:
+            self.pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.fanout = struct.unpack(">256I", self.index[8:8 + 1024])
+        self.count = self.fanout[255]
+        self.names_offset = 8 + 1024
+        self.offsets_offset = self.names_offset + 24 * self.count
+        self.large_offsets_offset = self.offsets_offset + 4 * self.count
+
+    def close(self):
+        self.index.close()
+        self.pack.close()
+
+    def find(self, binary_id):
+        """Offset of the object in the pack, or None"""
+        first = binary_id[0]
+        low = self.fanout[first - 1] if first else 0
+        high = self.fanout[first]
+        while low < high:
+            middle = (low + high) // 2
+            start = self.names_offset + 20 * middle
+            name = self.index[start:start + 20]
+            if name < binary_id:
+                low = middle + 1
+            elif name > binary_id:
+                high = middle
+            else:
+                return self._offset(middle)
+        return None
+
+    def _offset(self, position):
+        start = self.offsets_offset + 4 * position
+        offset = struct.unpack(">I", self.index[start:start + 4])[0]
+        if offset & 0x80000000:
+            start = self.large_offsets_offset + 8 * (offset & 0x7fffffff)
+            offset = struct.unpack(">Q", self.index[start:start + 8])[0]
+        return offset
+
+    def inflate(self, position, size):
+        # zlib never grows data by more than a few bytes, so small entries take a single window
+        window = min(65536, size + 64)
+        decompressor = zlib.decompressobj()
+        data = bytearray()
+        while not decompressor.eof and position < len(self.pack):
+            data += decompressor.decompress(self.pack[position:position + window])
+            position += window
+        if len(data) != size:
+            raise Unsupported("corrupt pack entry")
+        return bytes(data)
+
+    def entry(self, offset):
+        """(type number, size, data start, base) of the entry at offset"""
+        byte = self.pack[offset]
+        type_number = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        position = offset + 1
+        while byte & 0x80:
+            byte = self.pack[position]
+            position += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+
+        base = None
+        if type_number == OFS_DELTA:
+            byte = self.pack[position]
+            position += 1
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = self.pack[position]
+                position += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            base = offset - distance
+        elif type_number == REF_DELTA:
+            base = self.pack[position:position + 20]
+            position += 20
+        return type_number, size, position, base
+
+class ObjectDatabase:
+    """In-process, read-only access to a repository's refs and objects.
+
+    Reads HEAD, loose and packed refs, zlib-compressed loose objects and
+    version 2 packs (including delta chains), and keeps recently read
+    objects in a small LRU cache. Anything else, such as reftable,
+    SHA-256 repositories or alternates, raises Unsupported so that the
+    caller can ask git instead.
+    """
+
+    def __init__(self, repo_path, cache_size=1024):
+        self.git_dir = self._find_git_dir(repo_path)
+        self.common_dir = self.git_dir
+        commondir_file = os.path.join(self.git_dir, "commondir")
+        if os.path.exists(commondir_file):
+            with open(commondir_file, 'r') as f:
+                self.common_dir = os.path.normpath(os.path.join(self.git_dir, f.read().strip()))
+        self.objects_dir = os.path.join(self.common_dir, "objects")
+        self._check_supported()
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.packs = {}
+        self.packed_refs = None
+        self.packed_refs_stamp = None
+        self.lock = threading.RLock()
+
+    def _find_git_dir(self, repo_path):
+        dot_git = os.path.join(repo_path, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            with open(dot_git, 'r') as f:
+                content = f.read().strip()
+            if content.startswith("gitdir: "):
+                return os.path.normpath(os.path.join(repo_path, content[len("gitdir: "):]))
+        raise Unsupported(f"no git directory in {repo_path}")
+
+    def _check_supported(self):
+        try:
+            with open(os.path.join(self.common_dir, "config"), 'r') as f:
+                config = f.read().lower()
+        except OSError:
+            config = ""
+        if re.search(r"^\s*(objectformat|refstorage)\s*=", config, re.MULTILINE):
+            raise Unsupported("non-default object format or ref storage")
+        if os.path.exists(os.path.join(self.objects_dir, "info", "alternates")):
+            raise Unsupported("alternate object directories")
+
+    def close(self):
+        with self.lock:
+            for pack in self.packs.values():
+                pack.close()
+            self.packs.clear()
+            self.cache.clear()
+
+    # Refs
+
+    def _read_ref_file(self, path):
+        """(symbolic ref, object id) held by a loose ref file, one of them None, or None without such a file"""
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            return None
+        if content.startswith(b"ref: "):
+            return content[5:].strip().decode(errors="surrogateescape"), None
+        match = LOOSE_REF.match(content)
+        if not match:
+            raise Unsupported(f"unrecognised ref file {path}")
+        return None, match.group(1).decode()
+
+    def _packed_refs(self):
+        path = os.path.join(self.common_dir, "packed-refs")
+        try:
+            stat = os.stat(path)
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return {}
+        if stamp != self.packed_refs_stamp:
+            refs = {}
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.startswith(("#", "^")):
+                        continue
+                    object_id, _, name = line.strip().partition(" ")
+                    refs[name] = object_id
+            self.packed_refs, self.packed_refs_stamp = refs, stamp
+        return self.packed_refs
+
+    def _ref_dir(self, name):
+        """Per-worktree refs live in the worktree's git dir, the rest in the common dir"""
+        if PSEUDO_REF.match(name) or name.startswith(("refs/bisect/", "refs/worktree/", "refs/rewritten/")):
+            return self.git_dir
+        return self.common_dir
+
+    def read_ref(self, name, depth=0):
+        """Object id a ref points to, following symbolic refs, or None"""
+        if depth > 5:
+            raise Unsupported("symbolic ref loop")
+        # Like git, only pseudo-refs such as HEAD or ORIG_HEAD are read from outside refs/
+        if not name.startswith("refs/") and not PSEUDO_REF.match(name):
+            return None
+        with self.lock:
+            content = self._read_ref_file(os.path.join(self._ref_dir(name), name))
+            if content is None:
+                return self._packed_refs().get(name)
+        target, object_id = content
+        if target is not None:
+            return self.read_ref(target, depth + 1)
+        return object_id
+
+    def head(self):
+        """(branch ref, object id) for HEAD; the branch ref is None when HEAD is detached"""
+        content = self._read_ref_file(os.path.join(self.git_dir, "HEAD"))
+        if content is None:
+            raise Unsupported("missing HEAD")
+        target, object_id = content
+        if target is not None:
+            return target, self.read_ref(target)
+        return None, object_id
+
+    def refs(self, prefix="refs/"):
+        """{ref name: object id} for every ref under prefix"""
+        with self.lock:
+            refs = {name: object_id for name, object_id in self._packed_refs().items() if name.startswith(prefix)}
+        base = os.path.join(self.common_dir, prefix)
+        for root, _, files in os.walk(base):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = prefix + os.path.relpath(path, base).replace(os.sep, "/")
+                if file_name.endswith(".lock"):
+                    continue
+                content = self._read_ref_file(path)
+                if content:
+                    target, object_id = content
+                    refs[name] = self.read_ref(target) if target is not None else object_id
+        return {name: object_id for name, object_id in sorted(refs.items()) if object_id}
+
+    def resolve_name(self, name):
+        """Object id for a ref name or full object id, using git's ref lookup order"""
+        if re.fullmatch(r"[0-9a-f]{40}", name):
+            return name
+        if not PLAIN_NAME.match(name) or ".." in name:
+            raise Unsupported(f"revision syntax in {name}")
+        for candidate in (name, f"refs/{name}", f"refs/tags/{name}", f"refs/heads/{name}",
+                          f"refs/remotes/{name}", f"refs/remotes/{name}/HEAD"):
+            object_id = self.read_ref(candidate)
+            if object_id:
+                return object_id
+        if OBJECT_ID_LIKE.search(name):
+            raise Unsupported(f"{name} may be an abbreviated object id")
+        return None
+
+    def resolve(self, expression):
+        """Object id for "<name>", "<name>^{commit}", "<name>^{tree}" or "<name>:<path>", or None"""
+        name, peel, path = expression, None, None
+        if ":" in name:
+            name, _, path = name.partition(":")
+        for suffix in ("^{commit}", "^{tree}"):
+            if name.endswith(suffix):
+                name, peel = name[:-len(suffix)], suffix[2:-1]
+        object_id = self.resolve_name(name)
+        if object_id is None:
+            return None
+        if peel or path is not None:
+            object_id = self.peel(object_id, "tree" if path is not None else peel)
+            if object_id is None or path is None:
+                return object_id
+            for component in (c for c in path.split("/") if c):
+                entries = dict((entry_name, entry_id) for _, entry_name, entry_id in parse_tree(self.read(object_id)[1]))
+                object_id = entries.get(component)
+                if object_id is None:
+                    return None
+        return object_id
+
+    def peel(self, object_id, target):
+        """Follow tags (and commits, for a tree) until an object of type target, or None"""
+        for _ in range(16):
+            object_type, data = self.read(object_id)
+            if object_type == target:
+                return object_id
+            if object_type == "tag":
+                object_id = data.split(b"\n", 1)[0].split(b" ")[1].decode()
+            elif object_type == "commit" and target == "tree":
+                object_id = parse_commit(data)["tree"]
+            else:
+                return None
+        raise Unsupported("tag chain too long")
+
+    # Objects
+
+    def read(self, object_id):
+        """(type, content) of an object; raises Unsupported when it can't be found here"""
+        with self.lock:
+            if object_id in self.cache:
+                self.cache.move_to_end(object_id)
+                return self.cache[object_id]
+            result = self._read_loose(object_id) or self._read_packed(bytes.fromhex(object_id))
+            if result is None:
+                raise Unsupported(f"object {object_id} not found")
+            self._remember(object_id, result)
+            return result
+
+    def _remember(self, key, value):
+        self.cache[key] = value
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _read_loose(self, object_id):
+        path = os.path.join(self.objects_dir, object_id[:2], object_id[2:])
+        try:
+            with open(path, 'rb') as f:
+                raw = zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        header, _, data = raw.partition(b"\0")
+        object_type, size = header.decode().split(" ")
+        if int(size) != len(data):
+            raise Unsupported(f"corrupt loose object {object_id}")
+        return object_type, data
+
+    def _load_packs(self):
+        pack_dir = os.path.join(self.objects_dir, "pack")
+        try:
+            names = [name for name in os.listdir(pack_dir) if name.endswith(".idx")]
+        except FileNotFoundError:
+            return False
+        added = False
+        for name in names:
+            if name not in self.packs and os.path.exists(os.path.join(pack_dir, name[:-4] + ".pack")):
+                self.packs[name] = Pack(os.path.join(pack_dir, name))
+                added = True
+        return added
+
+    def _read_packed(self, binary_id):
+        if not self.packs:
+            self._load_packs()
+        for attempt in range(2):
+            for pack in self.packs.values():
+                offset = pack.find(binary_id)
+                if offset is not None:
+                    return self._read_pack_entry(pack, offset)
+            # The object may be in a pack written since the packs were listed
+            if attempt or not self._load_packs():
+                return None
+        return None
+
+    def _read_pack_entry(self, pack, offset, depth=0):
+        if depth > 64:
+            raise Unsupported("delta chain too long")
+        key = (pack.pack_path, offset)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        type_number, size, position, base = pack.entry(offset)
+        data = pack.inflate(position, size)
+        if type_number in OBJECT_TYPES:
+            return OBJECT_TYPES[type_number], data
+        if type_number == OFS_DELTA:
+            base_type, base_data = self._read_pack_entry(pack, base, depth + 1)
+        elif type_number == REF_DELTA:
+            base_type, base_data = self.read(base.hex())
+        else:
+            raise Unsupported(f"unknown pack entry type {type_number}")
+        result = (base_type, apply_delta(base_data, data))
+        # Delta bases are often shared, so keep resolved entries by pack offset too
+        self._remember(key, result)
+        return result
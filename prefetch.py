@@ -0,0 +1,133 @@
+# prefetch.py
+#
+# Builds the scenarios a learner is likely to start next while they work on
+# the current one. 'start-scenario' then only has to rename the prepared
+# repository into place. Prefetching runs in a detached, niced process that
+# builds at most PREFETCH_WORKERS scenarios at once.
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import template_cache
+from fileops import tree_size
+
+# Number of upcoming scenarios to keep ready; 0 turns prefetching off
+PREFETCH_COUNT = int(os.environ.get("GIT_LEARN_PREFETCH_COUNT", 2))
+PREFETCH_WORKERS = int(os.environ.get("GIT_LEARN_PREFETCH_WORKERS", 1))
+PREFETCH_NICENESS = 19
+
+def predict_next(scenarios, completed, current=None, count=PREFETCH_COUNT):
+    """The first count uncompleted scenarios after current, in list (difficulty) order"""
+    titles = [scenario.title for scenario in scenarios]
+    start = titles.index(current) + 1 if current in titles else 0
+    upcoming = scenarios[start:] + scenarios[:start]
+    return [scenario for scenario in upcoming
+            if scenario.title != current and not completed.get(scenario.title)][:count]
+
+def entry_path(session, scenario):
+    return os.path.join(session.prefetch_dir, template_cache.scenario_slug(scenario))
+
+def load_entry(path, scenario):
+    """The record of a prefetched repository if it was built from this version of scenario, else None"""
+    try:
+        with open(os.path.join(path, "prefetch.json"), 'r') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if info["scenario"] != scenario.title or info["source_hash"] != scenario.source_hash:
+        return None
+    return info
+
+def build_entry(manager, session, scenario):
+    """Copy a template of scenario into the session's prefetch directory, unless it's already there"""
+    path = entry_path(session, scenario)
+    if load_entry(path, scenario):
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(session.prefetch_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=".build-", dir=session.prefetch_dir)
+    try:
+        # Shares the host's generation slots with interactive starts
+        with manager.generation_slot():
+            variant, template = template_cache.create_workspace(scenario, os.path.join(build_dir, "repo"))
+        if tree_size(os.path.join(build_dir, "repo")) > manager.max_session_bytes:
+            return
+        with open(os.path.join(build_dir, "prefetch.json"), 'w') as f:
+            json.dump({"scenario": scenario.title, "source_hash": scenario.source_hash,
+                       "variant": variant, "template": template}, f)
+        # The entry only appears once it is complete, so start() never sees half of one
+        os.rename(build_dir, path)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+def claim(session, scenario):
+    """Move a prefetched repository of scenario to the session's repo_path.
+
+    Returns (variant, template) like template_cache.create_workspace(), or
+    None when nothing usable was prefetched and the caller has to build it.
+    """
+    path = entry_path(session, scenario)
+    info = load_entry(path, scenario)
+    try:
+        if info is None or not os.path.isdir(info["template"]):
+            return None
+        os.rename(os.path.join(path, "repo"), session.repo_path)
+    except OSError:
+        # Claimed by another start, or repo_path is on another filesystem
+        return None
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return info["variant"], info["template"]
+
+def schedule(session):
+    """Start a detached background process that prefetches the session's likely next scenarios"""
+    if PREFETCH_COUNT <= 0:
+        return
+    try:
+        with open(os.devnull, 'r+b') as devnull:
+            subprocess.Popen([sys.executable, "-m", "prefetch", session.name],
+                             cwd=os.path.dirname(os.path.abspath(__file__)),
+                             stdin=devnull, stdout=devnull, stderr=devnull, start_new_session=True)
+    except OSError:
+        # Prefetching is only an optimisation
+        pass
+
+def run(session_name):
+    """Prefetch the next scenarios of one session; only one of these runs per session at a time"""
+    # Imported here so that schedule(), which runs in every start, stays cheap
+    from concurrent.futures import ThreadPoolExecutor
+    from scenarios import SCENARIOS
+    import workspaces
+
+    os.nice(PREFETCH_NICENESS)
+    manager = workspaces.WorkspaceManager()
+    session = manager.session(session_name)
+    os.makedirs(session.prefetch_dir, exist_ok=True)
+    with open(os.path.join(session.prefetch_dir, ".lock"), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+
+        # Schedules made while this runs find the lock taken, so go again until the prediction settles
+        built = None
+        while True:
+            upcoming = predict_next(SCENARIOS, session.progress().load(), session.get_current_scenario())
+            wanted = {os.path.basename(entry_path(session, scenario)) for scenario in upcoming}
+            if wanted == built:
+                return
+            for name in os.listdir(session.prefetch_dir):
+                if name != ".lock" and name not in wanted:
+                    shutil.rmtree(os.path.join(session.prefetch_dir, name), ignore_errors=True)
+
+            with ThreadPoolExecutor(max_workers=max(1, PREFETCH_WORKERS)) as pool:
+                for _ in pool.map(lambda scenario: build_entry(manager, session, scenario), upcoming):
+                    pass
+            built = wanted
+
+if __name__ == '__main__':
+    run(sys.argv[1])
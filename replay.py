@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+from git_commands import generation_env, Repo
+import template_cache
+
+def replay_jobs(scenarios, size=None):
+    """(scenario title, variant, size) for every variant of every scenario"""
+    return [(scenario.title, variant, size) for scenario in scenarios for variant in range(scenario.variants)]
+
+def run_check(scenario, repo_path):
+    # A fresh Repo each time, so nothing read before a change is reused after it
+    with Repo(repo_path) as repo:
+        return bool(scenario.check_func(repo))
+
+def replay_scenario(title, variant=0, size=None):
+    """Generate a scenario, check it unsolved, apply its reference solution and check it again.
+
+    The result is correct when the first check fails and the second
+    passes. Generation bypasses the template cache, so it always runs the
+    scenario's current source.
+    """
+    from scenarios import SCENARIOS
+
+    result = {"scenario": title, "variant": variant, "size": size, "correct": False,
+              "unsolved_passed": None, "solved_passed": None, "error": None,
+              "generate_seconds": 0.0, "solve_seconds": 0.0, "check_seconds": 0.0}
+    scenario = next((s for s in SCENARIOS if s.title == title), None)
+    if not scenario:
+        result["error"] = f"Scenario '{title}' not found."
+        return result
+    if scenario.solve_func is None:
+        result["error"] = "Scenario has no reference solution."
+        return result
+
+    directory = tempfile.mkdtemp(prefix="git-learn-replay-")
+    repo_path = os.path.join(directory, "repo")
+    try:
+        start = time.perf_counter()
+        template_cache.build_scenario(scenario, repo_path, seed=variant if scenario.variants > 1 else None, size=size)
+        result["generate_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result["unsolved_passed"] = run_check(scenario, repo_path)
+        result["check_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Solutions run under the same isolated config as generation, so hooks and signing can't interfere
+        with Repo(repo_path, env=generation_env()) as repo:
+            scenario.solve_func(repo)
+        result["solve_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result["solved_passed"] = run_check(scenario, repo_path)
+        result["check_seconds"] += time.perf_counter() - start
+
+        result["correct"] = not result["unsolved_passed"] and result["solved_passed"]
+    except Exception as e:
+        result["error"] = str(e).strip()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        for key in ("generate_seconds", "solve_seconds", "check_seconds"):
+            result[key] = round(result[key], 6)
+    return result
+
+def replay(jobs, max_workers=None):
+    """Replay (title, variant, size) jobs in a process pool, yielding results as they finish"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        futures = [pool.submit(replay_scenario, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+def summarize(results, wall_seconds):
+    summary = {"replays": len(results), "correct": 0, "incorrect": 0, "errors": 0,
+               "wall_seconds": round(wall_seconds, 3)}
+    for key in ("generate_seconds", "solve_seconds", "check_seconds"):
+        summary[key] = round(sum(r[key] for r in results), 3)
+    for result in results:
+        if result["error"]:
+            summary["errors"] += 1
+        elif result["correct"]:
+            summary["correct"] += 1
+        else:
+            summary["incorrect"] += 1
+    return summary
@@ -0,0 +1,115 @@
+import hashlib
+import heapq
+import os
+
+def current_branch(repo):
+    """Name of the checked out branch, or None when HEAD is detached"""
+    return repo.reader.current_branch()
+
+def branches(repo):
+    return repo.reader.branches()
+
+def resolve(repo, ref):
+    """Commit id that ref points to, or None if it doesn't exist"""
+    return repo.reader.resolve(f"{ref}^{{commit}}")
+
+def resolve_object(repo, name):
+    """Id of any object, such as "<ref>:<path>" for a file, or None if it doesn't exist"""
+    return repo.reader.resolve(name)
+
+def file_at_ref(repo, ref, path, binary=False):
+    """Content of path in the tree of ref, or None if it doesn't exist there"""
+    object_type, content = repo.reader.read(f"{ref}:{path}")
+    if object_type != "blob":
+        return None
+    return content if binary else content.decode()
+
+def files_at_ref(repo, ref):
+    """Paths of all files in the tree of ref"""
+    reader = repo.reader
+    paths = []
+    pending = [("", f"{ref}^{{tree}}")]
+    while pending:
+        prefix, tree = pending.pop()
+        for mode, name, sha in reader.read_tree(tree) or []:
+            if mode == "40000":
+                pending.append((f"{prefix}{name}/", sha))
+            else:
+                paths.append(f"{prefix}{name}")
+    return sorted(paths)
+
+def walk_commits(repo, ref):
+    """Commits reachable from ref as (id, commit) pairs, newest committer date first"""
+    reader = repo.reader
+    start = resolve(repo, ref)
+    if start is None:
+        return
+    seen = {start}
+    queue = [(-reader.read_commit(start)["committer_time"], 0, start)]
+    order = 1
+    while queue:
+        _, _, sha = heapq.heappop(queue)
+        commit = reader.read_commit(sha)
+        yield sha, commit
+        for parent in commit["parents"]:
+            if parent not in seen:
+                seen.add(parent)
+                heapq.heappush(queue, (-reader.read_commit(parent)["committer_time"], order, parent))
+                order += 1
+
+def commit_count(repo, ref, base=None):
+    """Number of commits reachable from ref, excluding those reachable from base"""
+    excluded = {sha for sha, _ in walk_commits(repo, base)} if base else set()
+    return sum(1 for sha, _ in walk_commits(repo, ref) if sha not in excluded)
+
+def commit_subjects(repo, ref):
+    """Subject lines of the commits reachable from ref, newest first"""
+    return [" ".join(commit["message"].split("\n\n", 1)[0].split("\n")).strip()
+            for _, commit in walk_commits(repo, ref)]
+
+def worktree_file(repo, path, binary=False):
+    """Content of a file in the working tree, or None if it doesn't exist"""
+    try:
+        with open(repo.file(path), 'rb' if binary else 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def worktree_blob_id(repo, path, chunk_size=1024 * 1024):
+    """Git blob id of a working tree file, hashed a chunk at a time, or None if it doesn't exist"""
+    try:
+        with open(repo.file(path), 'rb') as f:
+            digest = hashlib.sha1(f"blob {os.fstat(f.fileno()).st_size}\0".encode())
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+
+def index_checksum(repo):
+    """Trailing checksum of the index file, with its stat data in case the index is written without one"""
+    path = os.path.join(repo.reader.git_dir(), "index")
+    try:
+        with open(path, 'rb') as f:
+            f.seek(-20, os.SEEK_END)
+            trailer = f.read().hex()
+    except OSError:
+        return None
+    return trailer, _stat_signature(path)
+
+def state_fingerprint(repo, paths=()):
+    """Digest of the state a checker can observe: HEAD, every ref, the index and the working tree files in paths.
+
+    Any commit, checkout, reset, staging or edit of those files changes it,
+    so equal fingerprints mean a checker would see the same repository.
+    """
+    state = (sorted(repo.reader.refs().items()), index_checksum(repo),
+             [(path, _stat_signature(repo.file(path))) for path in sorted(paths)])
+    return hashlib.sha1(repr(state).encode()).hexdigest()
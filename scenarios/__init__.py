@@ -1,16 +1,143 @@
-import os
+import ast
+import hashlib
 import importlib
-from .model import Scenario
+import json
+import operator
+import os
+import tempfile
+from pathlib import Path
+
+SCENARIOS_DIR = os.path.dirname(__file__)
+MANIFEST_FILE = os.environ.get(
+    "GIT_LEARN_MANIFEST", os.path.join(str(Path.home()), ".cache", "git-learn", "scenario_manifest.json"))
+
+# Scenario fields stored in the manifest, so listing scenarios needs no imports
+METADATA_FIELDS = ('title', 'difficulty', 'description', 'task', 'hints', 'variants', 'worktree_files', 'sizes')
+REQUIRED_FIELDS = ('title', 'difficulty', 'description', 'task', 'hints')
+# Bump when the manifest layout or METADATA_FIELDS change
+MANIFEST_FORMAT = 3
+# Arithmetic folded before literal_eval, so size presets can be written as 16 * 1024 * 1024
+ARITHMETIC = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul}
+
+class ScenarioInfo:
+    """Scenario metadata from the manifest.
+
+    Metadata fields are plain attributes. Anything else, such as
+    generate_func and check_func, imports the scenario module on first use.
+    """
+
+    def __init__(self, module_name, path, source_hash, metadata):
+        self.module_name = module_name
+        self.path = path
+        self.source_hash = source_hash
+        self.variants = 1
+        self.worktree_files = []
+        self.sizes = {}
+        for field, value in metadata.items():
+            setattr(self, field, value)
+        self._scenario = None
+
+    def __repr__(self):
+        return f"ScenarioInfo({self.title!r})"
+
+    def load(self):
+        """Import the scenario module and return its Scenario"""
+        if self._scenario is None:
+            from .model import Scenario
+            module = importlib.import_module(f'scenarios.{self.module_name}')
+            if not isinstance(getattr(module, 'scenario', None), Scenario):
+                raise ImportError(f"scenarios.{self.module_name} does not define a Scenario")
+            self._scenario = module.scenario
+        return self._scenario
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+class FoldArithmetic(ast.NodeTransformer):
+    """Replace ARITHMETIC on number literals with its result"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        operation = ARITHMETIC.get(type(node.op))
+        operands = (node.left, node.right)
+        if operation and all(isinstance(o, ast.Constant) and type(o.value) in (int, float) for o in operands):
+            return ast.Constant(operation(node.left.value, node.right.value))
+        return node
+
+def extract_metadata(source):
+    """Read the literal Scenario(...) arguments from a module's source without importing it"""
+    for node in ast.parse(source).body:
+        if (isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'scenario' for t in node.targets)
+                and isinstance(node.value, ast.Call)):
+            metadata = {}
+            for keyword in node.value.keywords:
+                if keyword.arg in METADATA_FIELDS:
+                    try:
+                        metadata[keyword.arg] = ast.literal_eval(FoldArithmetic().visit(keyword.value))
+                    except ValueError:
+                        pass
+            if all(field in metadata for field in REQUIRED_FIELDS):
+                return metadata
+    return None
+
+def import_metadata(module_name):
+    """Fallback for scenarios whose metadata isn't written as literals"""
+    from .model import Scenario
+    module = importlib.import_module(f'scenarios.{module_name}')
+    if not isinstance(getattr(module, 'scenario', None), Scenario):
+        return None
+    return {field: getattr(module.scenario, field) for field in METADATA_FIELDS}
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('modules', {}) if manifest.get('format') == MANIFEST_FORMAT else {}
+
+def save_manifest(modules):
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(MANIFEST_FILE), delete=False) as f:
+            json.dump({'format': MANIFEST_FORMAT, 'modules': modules}, f)
+        os.replace(f.name, MANIFEST_FILE)
+    except OSError:
+        # A read-only cache only costs a rebuild on the next run
+        pass
 
 def load_scenarios():
-    scenarios = []
-    scenario_files = [f[:-3] for f in os.listdir(os.path.dirname(__file__)) 
-                      if f.endswith('.py') and f != '__init__.py' and f != 'model.py']
-    
-    for scenario_file in scenario_files:
-        module = importlib.import_module(f'scenarios.{scenario_file}')
-        if hasattr(module, 'scenario') and isinstance(module.scenario, Scenario):
-            scenarios.append(module.scenario)
+    manifest = load_manifest()
+    modules = {}
+    changed = False
+
+    for file_name in sorted(os.listdir(SCENARIOS_DIR)):
+        if not file_name.endswith('.py') or file_name in ('__init__.py', 'model.py'):
+            continue
+        module_name = file_name[:-3]
+        path = os.path.join(SCENARIOS_DIR, file_name)
+        stat = os.stat(path)
+        entry = manifest.get(module_name)
+
+        if not entry or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            with open(path, 'rb') as f:
+                source = f.read()
+            source_hash = hashlib.sha256(source).hexdigest()
+            if not entry or entry['sha256'] != source_hash:
+                metadata = extract_metadata(source) or import_metadata(module_name)
+                entry = {'sha256': source_hash, 'metadata': metadata}
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            changed = True
+
+        modules[module_name] = entry
+
+    if changed or modules.keys() != manifest.keys():
+        save_manifest(modules)
+
+    scenarios = [ScenarioInfo(module_name, os.path.join(SCENARIOS_DIR, f"{module_name}.py"), entry['sha256'], entry['metadata'])
+                 for module_name, entry in modules.items() if entry['metadata']]
 
     difficulty_order = {"Easy": 1, "Medium": 2, "Hard": 3}
     return sorted(scenarios, key=lambda s: difficulty_order.get(s.difficulty, 4))
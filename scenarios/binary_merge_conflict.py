@@ -1,35 +1,52 @@
-import os
-from git_commands import run_git_command
+import random
+from git_commands import GitCommandError, HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+CHUNK_BYTES = 1024 * 1024
 
-    # Create a simple binary file (simulated with a text file)
-    with open('image.bin', 'wb') as f:
-        f.write(b'\x00\x01\x02\x03')
-        run_git_command(["add", "image.bin"])
-        run_git_command(["commit", "-m", "Add binary file"])
+def image_chunks(seed, size, suffix=b""):
+    """size bytes of seeded random content, generated a chunk at a time, then suffix"""
+    rng = random.Random(seed)
+    for start in range(0, size, CHUNK_BYTES):
+        yield rng.randbytes(min(CHUNK_BYTES, size - start))
+    if suffix:
+        yield suffix
 
-        # Create two branches with different modifications to the binary file
-        run_git_command(["checkout", "-b", "branch1"])
-        with open('image.bin', 'wb') as f:
-            f.write(b'\x00\x01\x02\x03\x04')
-            run_git_command(["commit", "-am", "Modify binary file in branch1"])
+def generate_scenario(repo, image_bytes=4, seed=None):
+    # Random image data doesn't compress, so store it as is rather than spend minutes in zlib
+    builder = HistoryBuilder(repo, compression=0)
 
-            run_git_command(["checkout", "main"])
-            run_git_command(["checkout", "-b", "branch2"])
-            with open('image.bin', 'wb') as f:
-                f.write(b'\x00\x01\x02\x03\x05')
-            run_git_command(["commit", "-am", "Modify binary file in branch2"])
+    def image(suffix=b""):
+        return builder.blob_stream(image_bytes + len(suffix), image_chunks(seed, image_bytes, suffix))
 
-            run_git_command(["checkout", "main"])
+    # Create a binary file
+    builder.commit("Add binary file", {'image.bin': image()})
 
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    with open('image.bin', 'rb') as f:
-        content = f.read()
-        return content == b'\x00\x01\x02\x03\x05'
+    # Create two branches with different modifications to the binary file
+    builder.branch("branch1", "main")
+    builder.commit("Modify binary file in branch1", {'image.bin': image(b'\x04')}, branch="branch1")
+
+    builder.branch("branch2", "main")
+    builder.commit("Modify binary file in branch2", {'image.bin': image(b'\x05')}, branch="branch2")
+
+    builder.finish(checkout="main")
+
+def check_scenario(repo):
+    # Compare object ids rather than contents, so the image is never read into memory
+    expected = repo_inspect.resolve_object(repo, "branch2:image.bin")
+    return expected is not None and repo_inspect.worktree_blob_id(repo, 'image.bin') == expected
+
+def solve_scenario(repo):
+    repo.run(['merge', 'branch1'])
+    try:
+        repo.run(['merge', 'branch2'])
+    except GitCommandError:
+        # The expected conflict on image.bin
+        pass
+    repo.run(['checkout', '--theirs', 'image.bin'])
+    repo.run(['add', 'image.bin'])
+    repo.run(['commit', '--no-edit'])
 
 scenario = Scenario(
     title="Resolve Binary File Merge Conflict",
@@ -46,5 +63,9 @@ scenario = Scenario(
         "If you encounter difficulties, 'git merge --abort' can be used to cancel the merge and start over.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario,
+    variants=4,
+    worktree_files=['image.bin'],
+    sizes={'medium': {'image_bytes': 16 * 1024 * 1024}, 'large': {'image_bytes': 256 * 1024 * 1024}}
 )
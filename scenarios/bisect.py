@@ -1,15 +1,9 @@
-import os
 import random
-import time
-from git_commands import run_git_command
+from git_commands import CommitClock, HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
-
-    # Create a simple Python script
-    with open('calc.py', 'w') as f:
-        f.write("""
+CALCULATOR = """
 def add(a, b):
     return a + b
 
@@ -21,39 +15,45 @@ def multiply(a, b):
 
 def divide(a, b):
     return a / b
-""")
+"""
 
-    run_git_command(["add", "calc.py"])
-    run_git_command(["commit", "-m", "Initial calculator implementation"])
-
-    # Make 20 commits, introducing a bug randomly
-    bug_commit = random.randint(5, 15)
-    for i in range(20):
-        time.sleep(1)  # Ensure unique timestamps for commits
-        if i == bug_commit:
-            # Introduce a bug in the multiply function
-            with open('calc.py', 'a') as f:
-                f.write("""
+BUG = """
 def multiply(a, b):
     return a * b + 1  # Bug: always adds 1 to the result
-""")
-        else:
-            # Add a harmless comment
-            with open('calc.py', 'a') as f:
-                f.write(f"\n# Commit {i}")
+"""
+
+def generate_scenario(repo, num_commits=20, seed=None):
+    rng = random.Random(seed)
+    builder = HistoryBuilder(repo, clock=CommitClock.after(repo, seed=seed), export_marks=False)
 
-        run_git_command(["commit", "-am", f"Update {i}"])
+    # Create a simple Python script
+    builder.commit("Initial calculator implementation", {'calc.py': CALCULATOR})
+
+    # Make num_commits commits, introducing a bug randomly in the middle half. Each commit
+    # only rewrites a trailing comment, so calc.py stays small however long the history gets.
+    bug_commit = rng.randint(num_commits // 4, num_commits * 3 // 4)
+    for i in range(num_commits):
+        content = CALCULATOR + (BUG if i >= bug_commit else "") + f"\n# Commit {i}\n"
+        builder.commit(f"Update {i}", {'calc.py': content})
 
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    with open('calc.py', 'r') as f:
-        content = f.read()
+    builder.finish(checkout="main")
+
+def check_scenario(repo):
+    content = repo_inspect.worktree_file(repo, 'calc.py') or ""
     return "return a * b" in content and "return a * b + 1" not in content
 
+def solve_scenario(repo):
+    root = repo.run(['rev-list', '--max-parents=0', 'HEAD'])
+    repo.run(['bisect', 'start', 'HEAD', root])
+    repo.run(['bisect', 'run', 'sh', '-c', "! grep -qF 'return a * b + 1' calc.py"])
+    first_bad = repo.run(['rev-parse', 'refs/bisect/bad'])
+    repo.run(['bisect', 'reset'])
+    repo.run(['checkout', f'{first_bad}~1', '--', 'calc.py'])
+
 scenario = Scenario(
     title="Find a Bug with Git Bisect",
     difficulty="Hard",
-    description="A bug was introduced in the 'multiply' function of calc.py somewhere in the last 20 commits.",
+    description="A bug was introduced in the 'multiply' function of calc.py somewhere in the commits since it was written.",
     task="Use git bisect to identify the commit that introduced the bug. The bug causes the multiply function to always add 1 to the correct result.",
     hints=[
         "The 'git bisect start' command initiates the bisect process.",
@@ -65,5 +65,9 @@ scenario = Scenario(
         "Once the bug is found, 'git bisect reset' will end the bisect session and return to the original HEAD.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario,
+    variants=8,
+    sizes={'medium': {'num_commits': 10000}, 'large': {'num_commits': 100000}, 'huge': {'num_commits': 1000000}},
+    worktree_files=['calc.py']
 )
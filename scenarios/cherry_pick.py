@@ -1,41 +1,43 @@
-import os
-from git_commands import run_git_command
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def vendored_files(num_files):
+    for i in range(num_files):
+        yield f"vendor/pkg{i // 1000:03d}/module{i}.py", f"# Vendored module {i}\n"
+
+def generate_scenario(repo, num_files=0):
+    builder = HistoryBuilder(repo)
+
+    # Optionally start from a wide tree of vendored code
+    if num_files:
+        builder.commit("Vendor dependencies", vendored_files(num_files))
 
     # Create some commits
     for i in range(3):
-        with open(f'file{i}.txt', 'w') as f:
-            f.write(f"Content {i}")
-        run_git_command(["add", f'file{i}.txt'])
-        run_git_command(["commit", "-m", f"Add file{i}.txt"])
+        builder.commit(f"Add file{i}.txt", {f'file{i}.txt': f"Content {i}"})
 
     # Create feature branch
-    run_git_command(["checkout", "-b", "feature-branch"])
+    builder.branch("feature-branch", "main")
 
     # Make some changes in feature branch
     for i in range(3, 6):
-        with open(f'file{i}.txt', 'w') as f:
-            f.write(f"Feature content {i}")
-        run_git_command(["add", f'file{i}.txt'])
-        run_git_command(["commit", "-m", f"Add feature file{i}.txt"])
+        builder.commit(f"Add feature file{i}.txt", {f'file{i}.txt': f"Feature content {i}"}, branch="feature-branch")
 
     # Add a bug fix commit
-    with open('bug_fix.txt', 'w') as f:
-        f.write("This is an important bug fix")
-    run_git_command(["add", "bug_fix.txt"])
-    bug_fix_commit = run_git_command(["commit", "-m", "Fix critical bug"])
+    builder.commit("Fix critical bug", {'bug_fix.txt': "This is an important bug fix"}, branch="feature-branch")
 
-    # Switch back to main
-    run_git_command(["checkout", "main"])
+    # Stay on main
+    builder.finish(checkout="main")
 
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    main_files = run_git_command(["ls-tree", "-r", "main", "--name-only"]).split("\n")
+def check_scenario(repo):
+    main_files = repo_inspect.files_at_ref(repo, "main")
     return "bug_fix.txt" in main_files
 
+def solve_scenario(repo):
+    repo.run(['cherry-pick', 'feature-branch'])
+    repo.run(['branch', '-f', 'feature-branch', 'feature-branch~1'])
+
 scenario = Scenario(
     title="Cherry-pick a Commit",
     difficulty="Medium",
@@ -50,5 +52,7 @@ scenario = Scenario(
         "The 'git push --force' command updates a remote branch, overwriting its history.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario,
+    sizes={'medium': {'num_files': 10000}, 'large': {'num_files': 50000}}
 )
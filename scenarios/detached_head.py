@@ -1,40 +1,34 @@
-import os
-from git_commands import run_git_command
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def generate_scenario(repo):
+    builder = HistoryBuilder(repo)
 
     # Create some commits
-    for i in range(5):
-        with open(f'file{i}.txt', 'w') as f:
-            f.write(f"Content {i}")
-        run_git_command(["add", f'file{i}.txt'])
-        run_git_command(["commit", "-m", f"Add file{i}.txt"])
+    commits = [builder.commit(f"Add file{i}.txt", {f'file{i}.txt': f"Content {i}"}) for i in range(5)]
 
-    # Get the hash of the third commit
-    commit_hash = run_git_command(["rev-parse", "HEAD~2"])
+    # Make a change on top of the third commit, outside of any branch
+    builder.branch("refs/git-learn/detached", commits[2], temporary=True)
+    detached_commit = builder.commit("Change in detached HEAD",
+                                     {'detached_change.txt': "This change was made in a detached HEAD state"},
+                                     branch="refs/git-learn/detached")
 
     # Checkout that commit, leading to a detached HEAD
-    run_git_command(["checkout", commit_hash])
+    builder.finish(checkout=detached_commit, detach=True)
 
-    # Make a change in the detached HEAD state
-    with open('detached_change.txt', 'w') as f:
-        f.write("This change was made in a detached HEAD state")
-    run_git_command(["add", "detached_change.txt"])
-    run_git_command(["commit", "-m", "Change in detached HEAD"])
-
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    branches = run_git_command(["branch"]).split("\n")
-    if "recovery" not in branches:
+def check_scenario(repo):
+    if "recovery" not in repo_inspect.branches(repo):
         return False
-    current_branch = run_git_command(["rev-parse", "--abbrev-ref", "HEAD"])
-    if current_branch != "main":
+    if repo_inspect.current_branch(repo) != "main":
         return False
-    recovery_files = run_git_command(["ls-tree", "-r", "recovery", "--name-only"]).split("\n")
+    recovery_files = repo_inspect.files_at_ref(repo, "recovery")
     return "detached_change.txt" in recovery_files
 
+def solve_scenario(repo):
+    repo.run(['branch', 'recovery'])
+    repo.run(['checkout', 'main'])
+
 scenario = Scenario(
     title="Recover from Detached HEAD State",
     difficulty="Medium",
@@ -49,5 +43,6 @@ scenario = Scenario(
         "The 'git reflog' command shows a log of where your HEAD has been.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario
 )
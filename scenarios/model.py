@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Callable
+from typing import Callable, Optional
 
 class Scenario(BaseModel):
     title: str
@@ -9,6 +9,10 @@ class Scenario(BaseModel):
     hints: list[str]
     generate_func: Callable
     check_func: Callable
+    solve_func: Optional[Callable] = None  # Scripted reference solution, replayed by replay.py
+    variants: int = 1  # Number of seeded variants kept in the template cache
+    worktree_files: list[str] = []  # Working tree files check_func reads, so changes to them are noticed
+    sizes: dict[str, dict] = {}  # Size presets: generate_func keyword arguments for bigger repositories
 
     class Config:
         arbitrary_types_allowed = True  # This allows us to use Callable
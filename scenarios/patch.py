@@ -1,26 +1,24 @@
 import os
-from git_commands import run_git_command
+import tempfile
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def generate_scenario(repo):
+    builder = HistoryBuilder(repo)
 
     # Create a file in main
-    with open('app.py', 'w') as f:
-        f.write("""
+    builder.commit("Initial app implementation", {'app.py': """
 def main():
     print("Hello, World!")
 
 if __name__ == "__main__":
     main()
-""")
-    run_git_command(["add", "app.py"])
-    run_git_command(["commit", "-m", "Initial app implementation"])
+"""})
 
     # Create a branch with changes
-    run_git_command(["checkout", "-b", "feature-branch"])
-    with open('app.py', 'w') as f:
-        f.write("""
+    builder.branch("feature-branch", "main")
+    builder.commit("Implement greeting function", {'app.py': """
 def greet(name):
     print(f"Hello, {name}!")
 
@@ -29,16 +27,25 @@ def main():
 
 if __name__ == "__main__":
     main()
-""")
-    run_git_command(["commit", "-am", "Implement greeting function"])
-
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    run_git_command(["checkout", "main"])
-    with open('app.py', 'r') as f:
-        content = f.read()
+"""}, branch="feature-branch")
+
+    builder.finish(checkout="feature-branch")
+
+def check_scenario(repo):
+    # On main, a patch applied with 'git apply' and not yet committed counts too
+    if repo_inspect.current_branch(repo) == "main":
+        content = repo_inspect.worktree_file(repo, 'app.py')
+    else:
+        content = repo_inspect.file_at_ref(repo, "main", 'app.py')
+    content = content or ""
     return "def greet(name):" in content and "greet(\"World\")" in content
 
+def solve_scenario(repo):
+    with tempfile.TemporaryDirectory() as directory:
+        repo.run(['format-patch', '-o', directory, 'main..feature-branch'])
+        repo.run(['checkout', 'main'])
+        repo.run(['am'] + sorted(os.path.join(directory, name) for name in os.listdir(directory)))
+
 scenario = Scenario(
     title="Create and Apply a Patch",
     difficulty="Medium",
@@ -50,5 +57,7 @@ scenario = Scenario(
         "The 'git am' command applies patch files to your current branch, integrating changes from patches into your repository.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario,
+    worktree_files=['app.py']
 )
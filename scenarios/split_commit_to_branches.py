@@ -1,58 +1,55 @@
-import os
-from git_commands import run_git_command
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def generate_scenario(repo):
+    builder = HistoryBuilder(repo)
 
     # Create multiple files with changes and dependencies
-    with open('feature1.py', 'w') as f:
-        f.write("def feature1():\n    return 'Feature 1 output'\n")
+    builder.commit("Implement multiple interdependent features in one commit", {
+        'feature1.py': "def feature1():\n    return 'Feature 1 output'\n",
+        'feature2.py': ("from feature1 import feature1\n\n"
+                        "def feature2():\n"
+                        "    return f'Feature 2 uses {feature1()}'\n"),
+        'feature3.py': ("from feature2 import feature2\n\n"
+                        "def feature3():\n"
+                        "    return f'Feature 3 builds on {feature2()}'\n"),
+    })
 
-    with open('feature2.py', 'w') as f:
-        f.write("from feature1 import feature1\n\n"
-                "def feature2():\n"
-                "    return f'Feature 2 uses {feature1()}'\n")
+    builder.finish(checkout="main")
 
-    with open('feature3.py', 'w') as f:
-        f.write("from feature2 import feature2\n\n"
-                "def feature3():\n"
-                "    return f'Feature 3 builds on {feature2()}'\n")
-
-    run_git_command(["add", "."])
-    run_git_command(["commit", "-m", "Implement multiple interdependent features in one commit"])
-
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    
+def check_scenario(repo):
     # Check if we have three branches with one commit each
-    branches = run_git_command(["branch"]).split("\n")
-    branches = [b.strip() for b in branches if b.strip()]
+    branches = repo_inspect.branches(repo)
     if len(branches) != 3:
         return False
-    
+
     # Check the content and order of the branches
     expected_order = ['feature1', 'feature2', 'feature3']
     for i, branch in enumerate(sorted(branches)):
-        run_git_command(["checkout", branch])
-        
         # Check if the branch has only one commit (plus the initial commit)
-        commit_count = len(run_git_command(["log", "--oneline"]).split("\n"))
-        if commit_count != 2:
+        if repo_inspect.commit_count(repo, branch) != 2:
             return False
-        
+
         # Check if the correct file exists in each branch
-        if not os.path.exists(f'{expected_order[i]}.py'):
+        content = repo_inspect.file_at_ref(repo, branch, f'{expected_order[i]}.py')
+        if content is None:
             return False
-        
+
         # Check if the dependencies are correct
-        with open(f'{expected_order[i]}.py', 'r') as f:
-            content = f.read()
-            if i > 0 and f'from {expected_order[i-1]}' not in content:
-                return False
-    
+        if i > 0 and f'from {expected_order[i-1]}' not in content:
+            return False
+
     return True
 
+def solve_scenario(repo):
+    # Each branch holds one feature on top of the initial commit; main goes once they all exist
+    for i in range(1, 4):
+        repo.run(['checkout', '-b', f'feature{i}', 'main~1'])
+        repo.run(['checkout', 'main', '--', f'feature{i}.py'])
+        repo.run(['commit', '-m', f"Implement feature{i}"])
+    repo.run(['branch', '-D', 'main'])
+
 scenario = Scenario(
     title="Split Commit to Multiple Branches",
     difficulty="Hard",
@@ -68,5 +65,6 @@ scenario = Scenario(
         "Creating separate branches for each feature can help organize your work and prepare for individual pull requests."
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario
 )
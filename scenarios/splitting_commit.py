@@ -1,23 +1,27 @@
-import os
-from git_commands import run_git_command
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def generate_scenario(repo):
+    builder = HistoryBuilder(repo)
 
     # Create a large commit with changes to multiple files
-    for i in range(3):
-        with open(f'feature{i}.py', 'w') as f:
-            f.write(f"def feature{i}():\n    print('This is feature {i}')\n")
-    
-    run_git_command(["add", "."])
-    run_git_command(["commit", "-m", "Implement multiple features"])
+    builder.commit("Implement multiple features", {
+        f'feature{i}.py': f"def feature{i}():\n    print('This is feature {i}')\n" for i in range(3)
+    })
+
+    builder.finish(checkout="main")
 
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    commit_messages = run_git_command(["log", "--format=%s", "main"]).split("\n")
+def check_scenario(repo):
+    commit_messages = repo_inspect.commit_subjects(repo, "main")
     return len(commit_messages) == 4 and sum("feature" in msg for msg in commit_messages) == 3
 
+def solve_scenario(repo):
+    repo.run(['reset', 'HEAD~1'])
+    for i in range(3):
+        repo.run(['add', f'feature{i}.py'])
+        repo.run(['commit', '-m', f"Implement feature{i}"])
+
 scenario = Scenario(
     title="Split a Large Commit",
     difficulty="Hard",
@@ -30,5 +34,6 @@ scenario = Scenario(
         "Git's 'cherry-pick' can apply the changes from a specific commit to your current branch, which can be useful in reorganizing commits.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario
 )
@@ -1,26 +1,28 @@
-import os
-from git_commands import run_git_command
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def generate_scenario(repo):
+    builder = HistoryBuilder(repo)
 
     # Create a feature branch with many small commits
-    run_git_command(["checkout", "-b", "feature-branch"])
+    builder.branch("feature-branch", "main")
 
     for i in range(10):
-        with open(f'file{i}.txt', 'w') as f:
-            f.write(f"Content {i}")
-        run_git_command(["add", f'file{i}.txt'])
-        run_git_command(["commit", "-m", f"Add file{i}.txt"])
+        builder.commit(f"Add file{i}.txt", {f'file{i}.txt': f"Content {i}"}, branch="feature-branch")
 
-def check_scenario(repo_path):
-    os.chdir(repo_path)
-    commit_messages = run_git_command(["log", "--format=%s", "feature-branch"]).split("\n")
+    builder.finish(checkout="feature-branch")
+
+def check_scenario(repo):
+    commit_messages = repo_inspect.commit_subjects(repo, "feature-branch")
     return (len(commit_messages) == 2 and
             commit_messages[0] == "Implement new feature" and
             commit_messages[1] == "Initial commit")
 
+def solve_scenario(repo):
+    repo.run(['reset', '--soft', 'main'])
+    repo.run(['commit', '-m', "Implement new feature"])
+
 scenario = Scenario(
     title="Squash Commits",
     difficulty="Medium",
@@ -33,5 +35,6 @@ scenario = Scenario(
         "After squashing commits, you may need to force push with 'git push --force' to update a remote branch, but be cautious as this rewrites history.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario
 )
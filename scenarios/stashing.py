@@ -1,66 +1,70 @@
-import os
-from git_commands import run_git_command
+from git_commands import HistoryBuilder
+import repo_inspect
 from .model import Scenario
 
-def generate_scenario(repo_path):
-    os.chdir(repo_path)
+def generate_scenario(repo):
+    builder = HistoryBuilder(repo)
 
-    with open('app.py', 'w') as f:
-        f.write("""
+    app_commit = builder.commit("Initial app implementation", {'app.py': """
 def main():
     print("Hello, World!")
 
 if __name__ == "__main__":
     main()
-""")
-    run_git_command(["add", "app.py"])
-    run_git_command(["commit", "-m", "Initial app implementation"])
+"""})
 
-    # Create and switch to feature branch
-    run_git_command(["checkout", "-b", "feature-branch"])
-    
-    # Make some uncommitted changes
-    with open('app.py', 'a') as f:
-        f.write("""
-def new_feature():
-    print("This is a new feature!")
+    # Create the feature branch
+    builder.branch("feature-branch", app_commit)
 
-# TODO: Integrate new_feature into main
-""")
+    # Introduce a "critical bug" on main
+    builder.commit("Update main function (with bug)", {'app.py': """
+def main():
+    print("Hello, World!")
+    critial_bug()  # Typo: should be 'critical_bug'
+
+if __name__ == "__main__":
+    main()
+"""})
 
-    # Switch back to main and introduce a "critical bug"
-    run_git_command(["checkout", "main"])
-    with open('app.py', 'w') as f:
+    # Leave the learner on feature-branch in the middle of new work
+    builder.finish(checkout="feature-branch")
+    with open(repo.file('app.py'), 'w') as f:
         f.write("""
 def main():
     print("Hello, World!")
-    critial_bug()  # Typo: should be 'critical_bug'
+
+def new_feature():
+    print("This is a new feature")
 
 if __name__ == "__main__":
     main()
 """)
-    run_git_command(["commit", "-am", "Update main function (with bug)"])
 
-def check_scenario(repo_path):
-    os.chdir(repo_path)
+def check_scenario(repo):
     # Check if we're on feature-branch
-    current_branch = run_git_command(["rev-parse", "--abbrev-ref", "HEAD"])
-    if current_branch != "feature-branch":
+    if repo_inspect.current_branch(repo) != "feature-branch":
         return False
-    
+
     # Check if the bug is fixed in main
-    run_git_command(["checkout", "main"])
-    with open('app.py', 'r') as f:
-        content = f.read()
+    content = repo_inspect.file_at_ref(repo, "main", 'app.py') or ""
     if "critical_bug()" not in content:
         return False
-    
-    # Check if the new feature is in feature-branch
-    run_git_command(["checkout", "feature-branch"])
-    with open('app.py', 'r') as f:
-        content = f.read()
+
+    # Check if the stashed feature was applied to the feature-branch working tree
+    content = repo_inspect.worktree_file(repo, 'app.py') or ""
     return "def new_feature():" in content
 
+def solve_scenario(repo):
+    repo.run(['stash', 'push'])
+    repo.run(['checkout', 'main'])
+    with open(repo.file('app.py'), 'r') as f:
+        content = f.read()
+    with open(repo.file('app.py'), 'w') as f:
+        f.write(content.replace("critial_bug()", "critical_bug()"))
+    repo.run(['commit', '-am', "Fix typo in critical_bug call"])
+    repo.run(['checkout', 'feature-branch'])
+    repo.run(['stash', 'pop'])
+
 scenario = Scenario(
     title="Stash Changes and Apply",
     difficulty="Easy",
@@ -73,5 +77,7 @@ scenario = Scenario(
         "You can create a branch from a stash using 'git stash branch', which can be useful for testing stashed changes.",
     ],
     generate_func=generate_scenario,
-    check_func=check_scenario
+    check_func=check_scenario,
+    solve_func=solve_scenario,
+    worktree_files=['app.py']
 )
@@ -0,0 +1,179 @@
+import io
+import json
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+from git_commands import generation_env, Repo
+from fileops import tree_size
+import template_cache
+import workspaces
+
+# Bump when the layout of an exported session changes
+ARCHIVE_FORMAT = 1
+ZERO_ID = "0" * 40
+OBJECT_ID = re.compile(r"\b[0-9a-f]{40}\b")
+# Where an in-progress merge, cherry-pick, revert, rebase or am keeps the commits it works on
+STATE_DIRECTORIES = ("rebase-merge", "rebase-apply", "sequencer")
+
+def reflog_objects(git_dir):
+    """Every object id recorded in the repository's reflogs, so older stashes and lost commits survive a move"""
+    ids = set()
+    for root, _, files in os.walk(os.path.join(git_dir, "logs")):
+        for name in files:
+            with open(os.path.join(root, name), 'r', errors='replace') as f:
+                for line in f:
+                    ids.update(line.split(None, 2)[:2])
+    ids.discard(ZERO_ID)
+    return ids
+
+def state_objects(git_dir):
+    """Object ids in pseudo-refs such as ORIG_HEAD and MERGE_HEAD and in rebase and sequencer state"""
+    paths = [os.path.join(git_dir, name) for name in os.listdir(git_dir) if name.endswith("HEAD")]
+    for directory in STATE_DIRECTORIES:
+        for root, _, files in os.walk(os.path.join(git_dir, directory)):
+            paths.extend(os.path.join(root, name) for name in files)
+    ids = set()
+    for path in paths:
+        if os.path.isfile(path):
+            with open(path, 'r', errors='replace') as f:
+                ids.update(OBJECT_ID.findall(f.read()))
+    return ids
+
+def index_objects(repo):
+    """Blob ids of every index entry, including conflict stages and changes staged but not committed"""
+    ids = set()
+    for line in repo.run(['ls-files', '--stage', '-z']).split("\0"):
+        if not line:
+            continue
+        mode, object_id = line.split(" ", 2)[:2]
+        # Submodule commits live in another repository
+        if mode != "160000":
+            ids.add(object_id)
+    return ids
+
+def _without(excluded, skip_locks=False):
+    """tarfile filter that leaves out the member excluded (and everything under it) and, optionally, lock files"""
+    def tar_filter(tarinfo):
+        if tarinfo.name == excluded or (skip_locks and tarinfo.name.endswith(".lock")):
+            return None
+        return tarinfo
+    return tar_filter
+
+def _add_bytes(tar, name, data):
+    tarinfo = tarfile.TarInfo(name)
+    tarinfo.size = len(data)
+    tarinfo.mtime = int(time.time())
+    tar.addfile(tarinfo, io.BytesIO(data))
+
+def export_session(session, fileobj):
+    """Write a session to fileobj as an uncompressed tar stream.
+
+    The stream holds session.json (current scenario, snapshot record and
+    progress), repo.bundle (a git bundle of every ref plus every object a
+    reflog points at), git/ (the git directory without its objects: refs,
+    reflogs, the index, config and in-progress merge, rebase or bisect
+    state) and worktree/ (the working tree). Git objects are already
+    compressed inside the bundle.
+    """
+    if not os.path.isdir(os.path.join(session.repo_path, ".git")):
+        raise ValueError(f"Session '{session.name}' has no repository to export.")
+
+    snapshot = None
+    try:
+        with open(session.snapshot_manifest, 'r') as f:
+            snapshot = {key: value for key, value in json.load(f).items() if key != "files"}
+    except (OSError, ValueError):
+        pass
+    metadata = {"format": ARCHIVE_FORMAT, "session": session.name, "scenario": session.get_current_scenario(),
+                "snapshot": snapshot, "completed": session.progress().load()}
+
+    with Repo(session.repo_path, env=generation_env()) as repo, tempfile.TemporaryDirectory() as directory:
+        git_dir = repo.reader.git_dir()
+        bundle = os.path.join(directory, "repo.bundle")
+        # Objects that only reflogs, state files or the index point at go to the bundle as extra revisions.
+        # Reflogs and state files can outlive what they name, so those are checked first.
+        extra_ids = {object_id for object_id in reflog_objects(git_dir) | state_objects(git_dir)
+                     if repo.reader.resolve(f"{object_id}^{{tree}}")}
+        extra_ids |= index_objects(repo)
+        repo.run(['bundle', 'create', '-q', bundle, '--all', '--stdin'], input="".join(f"{i}\n" for i in sorted(extra_ids)))
+
+        with tarfile.open(fileobj=fileobj, mode='w|') as tar:
+            _add_bytes(tar, "session.json", json.dumps(metadata).encode())
+            tar.add(bundle, "repo.bundle")
+            # Locks belong to git processes on this host and would only block git on the next one
+            tar.add(git_dir, "git", filter=_without("git/objects", skip_locks=True))
+            tar.add(session.repo_path, "worktree", filter=_without("worktree/.git"))
+
+def import_session(manager, session, fileobj, replace=False):
+    """Recreate a session from a stream written by export_session() and return its metadata.
+
+    The repository is assembled next to the session's repo_path and moved
+    into place only once it is complete. Progress is merged into the
+    session's progress store. When the template the session started from
+    is still current, it becomes the snapshot for reset(); otherwise
+    reset() starts the scenario again.
+    """
+    if session.exists() and not replace:
+        raise ValueError(f"Session '{session.name}' already exists. Remove it first or replace it.")
+    if not session.exists() and len(manager.sessions()) >= manager.max_sessions:
+        raise workspaces.QuotaExceeded(f"Session limit of {manager.max_sessions} reached.")
+
+    parent = os.path.dirname(session.repo_path)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".git-learn-import-", dir=parent)
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+            tar.extractall(staging, filter='data')
+        with open(os.path.join(staging, "session.json"), 'r') as f:
+            metadata = json.load(f)
+        if metadata.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"Unsupported session archive format {metadata.get('format')!r}.")
+
+        # Unbundle into an empty repository first, since the archived refs point at objects it brings
+        objects_path = os.path.join(staging, "objects")
+        os.mkdir(objects_path)
+        with Repo(objects_path, env=generation_env()) as repo:
+            repo.run(['init', '-q', '--bare'])
+            repo.run(['bundle', 'unbundle', os.path.join(staging, "repo.bundle")])
+        os.rename(os.path.join(objects_path, "objects"), os.path.join(staging, "git", "objects"))
+        repo_path = os.path.join(staging, "worktree")
+        os.rename(os.path.join(staging, "git"), os.path.join(repo_path, ".git"))
+
+        used_bytes = tree_size(repo_path)
+        if used_bytes > manager.max_session_bytes:
+            raise workspaces.QuotaExceeded(
+                f"Session needs {used_bytes} bytes, more than the session quota of {manager.max_session_bytes}.")
+        if os.path.exists(session.repo_path):
+            shutil.rmtree(session.repo_path)
+        manager.drop_snapshot(session)
+        os.rename(repo_path, session.repo_path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if metadata["scenario"]:
+        session.set_current_scenario(metadata["scenario"])
+    else:
+        session.clear_current_scenario()
+    completed = [title for title, done in metadata["completed"].items() if done]
+    if completed:
+        session.progress().mark_completed(*completed)
+    _adopt_snapshot(manager, session, metadata)
+    return metadata
+
+def _adopt_snapshot(manager, session, metadata):
+    from scenarios import SCENARIOS
+
+    snapshot = metadata["snapshot"]
+    scenario = next((s for s in SCENARIOS if s.title == metadata["scenario"]), None)
+    if not snapshot or not scenario or snapshot["source_hash"] != scenario.source_hash:
+        return
+    try:
+        with manager.generation_slot():
+            template = template_cache.get_template(scenario, snapshot["variant"], snapshot["size"])
+        manager.snapshot(session, scenario, template, snapshot["variant"], snapshot["size"], repo_matches=False)
+    except Exception:
+        # Without a snapshot, reset() starts the scenario again instead
+        manager.drop_snapshot(session)
@@ -8,13 +8,13 @@ setup(
     install_requires=[
         "Click",
     ],
-    py_modules=['cli', 'git_commands', 'completed_scenarios'],
+    py_modules=['cli', 'git_commands', 'completed_scenarios', 'fileops', 'template_cache', 'repo_inspect', 'workspaces', 'grading', 'odb', 'daemon', 'git_learn_client', 'watch', 'check_cache', 'events', 'prefetch', 'replay', 'session_archive'],
     package_data={
         'scenarios': ['*.py'],
     },
     entry_points={
         "console_scripts": [
-            "git-learn=cli:cli",
+            "git-learn=git_learn_client:main",
         ],
     },
 )
@@ -0,0 +1,201 @@
+import fcntl
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from git_commands import run_git_command, generation_env, CommitClock, Repo, BIG_FILE_THRESHOLD
+from fileops import copy_tree, tree_size
+
+HOME_DIR = str(Path.home())
+CACHE_DIR = os.environ.get("GIT_LEARN_TEMPLATE_DIR", os.path.join(HOME_DIR, ".cache", "git-learn", "templates"))
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+LOCK_FILE = os.path.join(CACHE_DIR, ".lock")
+MAX_CACHE_BYTES = int(os.environ.get("GIT_LEARN_TEMPLATE_MAX_BYTES", 512 * 1024 * 1024))
+# Templates of size presets have a budget of their own, so one large template doesn't evict every default
+# one. A single large preset takes a little over 1 GB, and the budget always keeps the one just used.
+MAX_SIZED_CACHE_BYTES = int(os.environ.get("GIT_LEARN_TEMPLATE_MAX_SIZED_BYTES", 4 * 1024 * 1024 * 1024))
+
+# Bump when the layout of a built template changes
+TEMPLATE_FORMAT = 4
+# Records which scenario a repository was generated for, e.g. for grading
+SCENARIO_MARKER = os.path.join(".git", "git-learn-scenario")
+# Repository settings the learner works with, written once generation is done
+LEARNER_CONFIG = {
+    # Stream big files in and out of the object store instead of loading them whole
+    "core.bigFileThreshold": BIG_FILE_THRESHOLD,
+    # Scenarios and their checkers expect the files exactly as they were generated
+    "core.autocrlf": "false",
+}
+
+def size_arguments(scenario, size):
+    """generate_func keyword arguments for a size preset; None is the scenario's default size"""
+    if size is None:
+        return {}
+    if size not in scenario.sizes:
+        available = ", ".join(scenario.sizes) or "none"
+        raise ValueError(f"Scenario '{scenario.title}' has no '{size}' size (available: {available}).")
+    return scenario.sizes[size]
+
+def optimize_repository(repo):
+    """Pack everything and write a multi-pack index and commit-graph, so log and bisect stay fast on long histories"""
+    # Only the loose objects are packed; the multi-pack index covers fast-import's pack without rewriting it
+    repo.run(['repack', '-d', '-q'])
+    repo.run(['multi-pack-index', 'write'])
+    repo.run(['commit-graph', 'write', '--reachable'])
+
+def build_scenario(scenario, repo_path, seed=None, size=None):
+    """Create a new repository at repo_path and generate the scenario in it.
+
+    Generation ignores the user's git config (see git_commands.GENERATION_CONFIG),
+    so their hooks and settings neither slow it down nor change what it builds.
+    """
+    os.mkdir(repo_path)
+    with Repo(repo_path, env=generation_env()) as repo:
+        # Generators build on 'main', whatever the host's init.defaultBranch says
+        repo.run(['init', '--initial-branch=main'])
+        with open(repo.file('README.md'), 'w') as f:
+            f.write("# Git Learning Repository\n\nThis repository is for learning Git commands.\n")
+        repo.run(['add', 'README.md'])
+        repo.run(['commit', '-m', 'Initial commit'], env=CommitClock().env())
+
+        arguments = dict(size_arguments(scenario, size))
+        if seed is not None:
+            arguments['seed'] = seed
+        scenario.generate_func(repo, **arguments)
+        optimize_repository(repo)
+
+        for key, value in LEARNER_CONFIG.items():
+            repo.run(['config', key, value])
+        with open(repo.file(SCENARIO_MARKER), 'w') as f:
+            f.write(scenario.title)
+
+@lru_cache(maxsize=None)
+def git_version():
+    return run_git_command(['--version'])
+
+def scenario_key(scenario):
+    """Hash of the scenario module source and the git version"""
+    digest = hashlib.sha256(f"{TEMPLATE_FORMAT}\0{git_version()}\0{scenario.source_hash}".encode())
+    return digest.hexdigest()[:16]
+
+def scenario_slug(scenario):
+    return "".join(c if c.isalnum() else "-" for c in scenario.title.lower())
+
+@contextmanager
+def locked_index():
+    """Hold the cache lock and yield the index, saving it afterwards"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = {}
+        if os.path.exists(INDEX_FILE):
+            with open(INDEX_FILE, 'r') as f:
+                index = json.load(f)
+        yield index
+        with tempfile.NamedTemporaryFile('w', dir=CACHE_DIR, delete=False) as f:
+            json.dump(index, f)
+        os.replace(f.name, INDEX_FILE)
+
+@contextmanager
+def template_in_use(path):
+    """Hold a shared lock on the template at path while it is copied; yields whether it still exists.
+
+    Eviction only removes templates it can lock exclusively, so a template
+    can't disappear half way through a copy.
+    """
+    with open(f"{path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        yield os.path.isdir(path)
+
+def remove_entry(index, entry):
+    """Delete a template and its index entry unless a copy of it is in progress; returns whether it was removed"""
+    path = os.path.join(CACHE_DIR, entry)
+    with open(f"{path}.lock", 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+    index.pop(entry, None)
+    return True
+
+def invalidate_stale(index, scenario, key):
+    """Drop entries built from an older version of the scenario"""
+    for entry, info in list(index.items()):
+        if info['title'] == scenario.title and info['key'] != key:
+            remove_entry(index, entry)
+
+def evict(index, keep):
+    """Remove least recently used templates until default-size ones fit MAX_CACHE_BYTES and sized ones MAX_SIZED_CACHE_BYTES"""
+    for sized, budget in ((False, MAX_CACHE_BYTES), (True, MAX_SIZED_CACHE_BYTES)):
+        entries = [(entry, info) for entry, info in index.items() if bool(info.get('preset')) == sized]
+        total = sum(info['size'] for _, info in entries)
+        for entry, info in sorted(entries, key=lambda item: item[1]['last_used']):
+            if total <= budget:
+                break
+            if entry != keep and remove_entry(index, entry):
+                total -= info['size']
+
+def get_template(scenario, variant=0, size=None):
+    """Return the path of a built template for the scenario variant and size, building it if needed"""
+    key = scenario_key(scenario)
+    entry = f"{scenario_slug(scenario)}-{key}/{f'{size}-' if size else ''}{variant}"
+    path = os.path.join(CACHE_DIR, entry)
+
+    while True:
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            build_dir = tempfile.mkdtemp(prefix=".build-", dir=os.path.dirname(path))
+            try:
+                build_scenario(scenario, os.path.join(build_dir, "repo"),
+                               seed=variant if scenario.variants > 1 else None, size=size)
+                os.rename(os.path.join(build_dir, "repo"), path)
+            except OSError:
+                # Another process finished building the same template first
+                if not os.path.exists(path):
+                    raise
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+
+        with locked_index() as index:
+            # Another process may have evicted the template since it was checked or built
+            if not os.path.exists(path):
+                index.pop(entry, None)
+                continue
+            invalidate_stale(index, scenario, key)
+            info = index.get(entry) or {'title': scenario.title, 'key': key, 'preset': size, 'size': tree_size(path)}
+            info['last_used'] = time.time()
+            index[entry] = info
+            evict(index, keep=entry)
+        return path
+
+def create_workspace(scenario, repo_path, variant=None, size=None):
+    """Create repo_path as a copy of a built template and return (variant used, template path)"""
+    size_arguments(scenario, size)
+    if variant is None:
+        variant = random.randrange(scenario.variants)
+    while True:
+        template = get_template(scenario, variant, size)
+        with template_in_use(template) as exists:
+            if exists:
+                copy_tree(template, repo_path)
+                return variant, template
+        # Evicted by another process before the copy started; build it again
+
+def warm(scenarios, max_workers=None):
+    """Build every variant of every scenario, several at a time"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = [(scenario, variant) for scenario in scenarios for variant in range(scenario.variants)]
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        for _ in pool.map(lambda job: get_template(*job), jobs):
+            pass
+
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,111 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+import repo_inspect
+
+# Seconds without further changes before a burst of changes counts as finished
+DEBOUNCE_SECONDS = 0.3
+# Seconds between fingerprint checks when inotify isn't available
+POLL_SECONDS = 1.0
+
+# inotify(7) constants
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+class InotifyWatcher:
+    """Waits for changes to a set of directories (not recursively) with inotify through ctypes"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, directory):
+        # Adding a directory that is already watched just returns its existing watch
+        self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+
+    def _drain(self):
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout=None):
+        """Block until something changes, then until DEBOUNCE_SECONDS pass without another change"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        self._drain()
+        while select.select([self.fd], [], [], DEBOUNCE_SECONDS)[0]:
+            self._drain()
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback that wakes up every POLL_SECONDS; the fingerprint decides whether anything changed"""
+
+    def add(self, directory):
+        pass
+
+    def wait(self, timeout=None):
+        time.sleep(POLL_SECONDS if timeout is None else min(timeout, POLL_SECONDS))
+        return True
+
+    def close(self):
+        pass
+
+def make_watcher():
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        return PollingWatcher()
+
+def watched_directories(repo, paths):
+    """Directories whose entries change when HEAD, a ref, the index or one of paths changes"""
+    git_dir = repo.reader.git_dir()
+    directories = [git_dir]
+    for root, dirs, _ in os.walk(os.path.join(git_dir, "refs")):
+        directories.append(root)
+    directories.extend(os.path.dirname(repo.file(path)) for path in paths)
+    return directories
+
+def watch_checks(repo, scenario):
+    """Run scenario.check_func now and after every change the checker could notice.
+
+    Yields each result. Bursts of changes, such as a rebase rewriting many
+    refs, are waited out first, and changes that leave the fingerprint as
+    it was (an editor touching an unrelated file, say) don't re-run the check.
+    """
+    watcher = make_watcher()
+    try:
+        last_fingerprint = None
+        while True:
+            # New ref directories (refs/heads/feature/...) appear as branches are created
+            for directory in watched_directories(repo, scenario.worktree_files):
+                if os.path.isdir(directory):
+                    watcher.add(directory)
+            fingerprint = repo_inspect.state_fingerprint(repo, scenario.worktree_files)
+            if fingerprint != last_fingerprint:
+                last_fingerprint = fingerprint
+                yield bool(scenario.check_func(repo))
+            watcher.wait()
+    finally:
+        watcher.close()
@@ -0,0 +1,235 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import prefetch
+import template_cache
+from completed_scenarios import get_progress_store, COMPLETED_SCENARIOS_FILE
+from fileops import copy_tree, restore_tree, stat_manifest, tree_size
+
+HOME_DIR = str(Path.home())
+SESSIONS_DIR = os.environ.get("GIT_LEARN_SESSIONS_DIR", os.path.join(HOME_DIR, ".git_learning", "sessions"))
+DEFAULT_SESSION = "default"
+
+# The default session keeps the original single-learner locations
+DEFAULT_REPO_PATH = os.path.join(HOME_DIR, "git_learning_repo")
+DEFAULT_SCENARIO_FILE = os.path.join(HOME_DIR, ".current_git_scenario")
+
+MAX_SESSIONS = int(os.environ.get("GIT_LEARN_MAX_SESSIONS", 1000))
+# Large scenario sizes need a little over 1 GB
+MAX_SESSION_BYTES = int(os.environ.get("GIT_LEARN_MAX_SESSION_BYTES", 2 * 1024 * 1024 * 1024))
+MAX_CONCURRENT_GENERATION = int(os.environ.get("GIT_LEARN_MAX_CONCURRENT_GENERATION", os.cpu_count() or 1))
+
+SESSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+class QuotaExceeded(Exception):
+    pass
+
+class Session:
+    """A learner workspace: a repository and the record of its current scenario"""
+
+    def __init__(self, name, root, repo_path, scenario_file):
+        self.name = name
+        self.root = root
+        self.repo_path = repo_path
+        self.scenario_file = scenario_file
+        self.snapshot_path = os.path.join(root, "snapshot")
+        self.snapshot_manifest = os.path.join(root, "snapshot.json")
+        self.prefetch_dir = os.path.join(root, "prefetch")
+
+    def __repr__(self):
+        return f"Session({self.name!r})"
+
+    def exists(self):
+        return os.path.exists(self.repo_path) or os.path.exists(self.scenario_file)
+
+    def get_current_scenario(self):
+        if os.path.exists(self.scenario_file):
+            with open(self.scenario_file, 'r') as f:
+                return f.read().strip()
+        return None
+
+    def set_current_scenario(self, scenario_name):
+        os.makedirs(os.path.dirname(self.scenario_file), exist_ok=True)
+        with open(self.scenario_file, 'w') as f:
+            f.write(scenario_name)
+
+    def clear_current_scenario(self):
+        if os.path.exists(self.scenario_file):
+            os.remove(self.scenario_file)
+
+    def progress(self):
+        """Progress store of the learner using this session"""
+        if self.name == DEFAULT_SESSION:
+            return get_progress_store(self.name, COMPLETED_SCENARIOS_FILE)
+        return get_progress_store(self.name, os.path.join(self.root, "completed_scenarios.json"))
+
+class WorkspaceManager:
+    """Named learner sessions on one host, with quotas and a cap on concurrent generation"""
+
+    def __init__(self, sessions_dir=SESSIONS_DIR, max_sessions=MAX_SESSIONS,
+                 max_session_bytes=MAX_SESSION_BYTES, max_concurrent_generation=MAX_CONCURRENT_GENERATION):
+        self.sessions_dir = sessions_dir
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.max_concurrent_generation = max(1, max_concurrent_generation)
+
+    def session(self, name=DEFAULT_SESSION):
+        if not SESSION_NAME.match(name):
+            raise ValueError(f"Invalid session name '{name}'. Use letters, digits, '.', '_' and '-'.")
+        root = os.path.join(self.sessions_dir, name)
+        if name == DEFAULT_SESSION:
+            return Session(name, root, DEFAULT_REPO_PATH, DEFAULT_SCENARIO_FILE)
+        return Session(name, root, os.path.join(root, "repo"), os.path.join(root, "current_scenario"))
+
+    def sessions(self):
+        """All sessions that have a repository or a current scenario"""
+        names = {DEFAULT_SESSION}
+        if os.path.isdir(self.sessions_dir):
+            names.update(name for name in os.listdir(self.sessions_dir) if SESSION_NAME.match(name))
+        return [session for session in map(self.session, sorted(names)) if session.exists()]
+
+    def clear(self, session):
+        """Delete the session's repository, current scenario and snapshot, keeping its progress"""
+        if os.path.exists(session.repo_path):
+            shutil.rmtree(session.repo_path)
+        session.clear_current_scenario()
+        self.drop_snapshot(session)
+
+    def remove(self, session):
+        """Delete the session entirely, including its progress"""
+        if os.path.exists(session.repo_path):
+            shutil.rmtree(session.repo_path)
+        session.clear_current_scenario()
+        shutil.rmtree(session.root, ignore_errors=True)
+
+    @contextmanager
+    def generation_slot(self):
+        """Wait for one of max_concurrent_generation slots, shared by every process on the host"""
+        slots_dir = os.path.join(self.sessions_dir, ".generation-slots")
+        os.makedirs(slots_dir, exist_ok=True)
+        while True:
+            for slot in range(self.max_concurrent_generation):
+                lock = open(os.path.join(slots_dir, f"{slot}.lock"), 'a')
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock.close()
+                    continue
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                    lock.close()
+                return
+            time.sleep(0.05)
+
+    def start(self, session, scenario, size=None):
+        """Replace the session's repository with a fresh copy of the scenario at the given size preset"""
+        if not session.exists() and len(self.sessions()) >= self.max_sessions:
+            raise QuotaExceeded(f"Session limit of {self.max_sessions} reached.")
+        template_cache.size_arguments(scenario, size)
+
+        if os.path.exists(session.repo_path):
+            shutil.rmtree(session.repo_path)
+        os.makedirs(os.path.dirname(session.repo_path), exist_ok=True)
+        # Prefetched repositories are only ever built at the default size
+        claimed = prefetch.claim(session, scenario) if size is None else None
+        if claimed:
+            variant, template = claimed
+        else:
+            with self.generation_slot():
+                variant, template = template_cache.create_workspace(scenario, session.repo_path, size=size)
+
+        used_bytes = tree_size(session.repo_path)
+        if used_bytes > self.max_session_bytes:
+            shutil.rmtree(session.repo_path)
+            raise QuotaExceeded(f"Scenario needs {used_bytes} bytes, more than the session quota of {self.max_session_bytes}.")
+        self.snapshot(session, scenario, template, variant, size)
+        session.set_current_scenario(scenario.title)
+
+    def snapshot(self, session, scenario, template, variant, size=None, repo_matches=True):
+        """Keep a copy of the template the session started from and a stat manifest of the new repository for reset().
+
+        Without repo_matches, the repository no longer looks like the
+        template (an imported session, say), so the first reset rewrites
+        every entry.
+        """
+        self.drop_snapshot(session)
+        with template_cache.template_in_use(template) as exists:
+            # Without the copy, reset() starts the scenario again at the size recorded below
+            if exists:
+                # Templates and snapshots are never written to, so they can share every file
+                copy_tree(template, session.snapshot_path, link_all=True)
+        files = stat_manifest(session.repo_path) if repo_matches else dict.fromkeys(stat_manifest(session.snapshot_path))
+        snapshot = {"scenario": scenario.title, "source_hash": scenario.source_hash, "variant": variant,
+                    "size": size, "files": files}
+        with open(session.snapshot_manifest, 'w') as f:
+            json.dump(snapshot, f)
+
+    def drop_snapshot(self, session):
+        if os.path.exists(session.snapshot_manifest):
+            os.remove(session.snapshot_manifest)
+        shutil.rmtree(session.snapshot_path, ignore_errors=True)
+
+    def load_snapshot(self, session, scenario):
+        """The session's snapshot record if it was taken for this version of scenario, else None"""
+        try:
+            with open(session.snapshot_manifest, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot["scenario"] != scenario.title or snapshot["source_hash"] != scenario.source_hash:
+            return None
+        return snapshot
+
+    def reset(self, session, scenario):
+        """Put the session's repository back to the scenario's starting state.
+
+        Restores the snapshot taken by start(), rewriting only the files
+        that changed since, and falls back to a full start() when there is
+        no usable snapshot.
+        """
+        snapshot = self.load_snapshot(session, scenario)
+        if snapshot is None or not os.path.isdir(session.snapshot_path):
+            # Start again at the size the session was started with, when that is still known
+            self.start(session, scenario, size=snapshot["size"] if snapshot else None)
+            return
+        snapshot["files"], _ = restore_tree(session.snapshot_path, session.repo_path, snapshot["files"])
+        with open(session.snapshot_manifest, 'w') as f:
+            json.dump(snapshot, f)
+        session.set_current_scenario(scenario.title)
+
+    def start_many(self, assignments, max_workers=None):
+        """Start scenarios for many sessions in a process pool.
+
+        assignments is a list of (session name, scenario title) pairs. Yields
+        (session name, error message or None) as each one finishes.
+        """
+        # Imported here so that CLI startup doesn't pay for multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        max_workers = min(max_workers or os.cpu_count() or 1, self.max_concurrent_generation)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_start_session, self.sessions_dir, self.max_sessions, self.max_session_bytes,
+                                   self.max_concurrent_generation, name, title): name
+                       for name, title in assignments}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+def _start_session(sessions_dir, max_sessions, max_session_bytes, max_concurrent_generation, name, title):
+    from scenarios import SCENARIOS
+
+    manager = WorkspaceManager(sessions_dir, max_sessions, max_session_bytes, max_concurrent_generation)
+    scenario = next((s for s in SCENARIOS if s.title == title), None)
+    if not scenario:
+        return f"Scenario '{title}' not found."
+    try:
+        manager.start(manager.session(name), scenario)
+    except Exception as e:
+        return str(e)
+    return None